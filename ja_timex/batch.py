@@ -0,0 +1,251 @@
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pendulum
+
+from ja_timex.pattern.place import Pattern
+from ja_timex.tag import TIMEX
+
+# TIMEXのうち、Patternとreferenceを除いた値をtupleで表したもの
+# (type, value, text, span, raw_text, raw_span, parsed, tid, freq, quant, mod, range_start, range_end, pattern_index)
+TimexPayload = Tuple[Any, ...]
+
+# ワーカープロセスごとに一度だけ復元されるTimexParser
+_worker_parser: Any = None
+
+
+def timex_to_payload(timex: TIMEX, pattern2index: Dict[int, int]) -> TimexPayload:
+    """TIMEXをプロセス間で受け渡すためのtupleに変換する
+
+    Patternはpickleせず、TimexParserが持つパターンのリスト中のインデックスで表す
+
+    Args:
+        timex (TIMEX): 変換するTIMEX
+        pattern2index (Dict[int, int]): Patternのidとインデックスの対応
+
+    Returns:
+        TimexPayload: TIMEXの値を持つtuple
+    """
+    pattern_index = pattern2index.get(id(timex.pattern)) if timex.pattern is not None else None
+    return (
+        timex.type,
+        timex.value,
+        timex.text,
+        timex.span,
+        timex.raw_text,
+        timex.raw_span,
+        timex.parsed,
+        timex.tid,
+        timex.freq,
+        timex.quant,
+        timex.mod,
+        timex.range_start,
+        timex.range_end,
+        pattern_index,
+    )
+
+
+def payload_to_timex(
+    payload: TimexPayload, patterns: Sequence[Pattern], reference: Optional[pendulum.DateTime]
+) -> TIMEX:
+    """timex_to_payload()で変換したtupleからTIMEXを復元する
+
+    Args:
+        payload (TimexPayload): TIMEXの値を持つtuple
+        patterns (Sequence[Pattern]): TimexParserが持つパターンのリスト
+        reference (Optional[pendulum.DateTime]): 基準日時
+
+    Returns:
+        TIMEX: 復元したTIMEX
+    """
+    (
+        type_name,
+        value,
+        text,
+        span,
+        raw_text,
+        raw_span,
+        parsed,
+        tid,
+        freq,
+        quant,
+        mod,
+        range_start,
+        range_end,
+        pattern_index,
+    ) = payload
+    return TIMEX(
+        type=type_name,
+        value=value,
+        text=text,
+        span=span,
+        raw_text=raw_text,
+        raw_span=raw_span,
+        parsed=dict(parsed),
+        tid=tid,
+        freq=freq,
+        quant=quant,
+        mod=mod,
+        range_start=range_start,
+        range_end=range_end,
+        pattern=patterns[pattern_index] if pattern_index is not None else None,
+        reference=reference if reference else None,
+    )
+
+
+class TimexColumns:
+    """複数の入力文字列から抽出したTIMEXを、TIMEXを生成せずに列ごとの配列で保持する
+
+    各行は1つのTIMEXを表し、doc_indexに入力文字列のインデックスを持つ。
+    文字列の列は、すべての列で共有する文字列表stringsのインデックスで保持し、Noneは-1とする。
+    数値の列はarrayで保持し、raw_spanやrange_start, range_endがNoneの場合は-1とする
+
+    e.g.
+        columns = parser.parse_batch_columnar(texts)
+        columns.to_pydict()["value"]
+        columns.to_arrow()  # pyarrowがインストールされている場合
+    """
+
+    string_columns = ("tid", "type", "value", "text", "mod", "freq", "quant")
+    int_columns = ("doc_index", "span_start", "span_end", "raw_span_start", "raw_span_end")
+    bool_columns = ("range_start", "range_end")
+    column_names = (
+        "doc_index",
+        "tid",
+        "type",
+        "value",
+        "text",
+        "span_start",
+        "span_end",
+        "raw_span_start",
+        "raw_span_end",
+        "mod",
+        "freq",
+        "quant",
+        "range_start",
+        "range_end",
+    )
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self._string2code: Dict[str, int] = {}
+        self.columns: Dict[str, array] = {}
+        for name in self.string_columns:
+            self.columns[name] = array("i")
+        for name in self.int_columns:
+            self.columns[name] = array("q")
+        for name in self.bool_columns:
+            self.columns[name] = array("b")
+
+    def __len__(self) -> int:
+        return len(self.columns["doc_index"])
+
+    def _encode(self, text: Optional[str]) -> int:
+        if text is None:
+            return -1
+        code = self._string2code.get(text)
+        if code is None:
+            code = self._string2code[text] = len(self.strings)
+            self.strings.append(text)
+        return code
+
+    def append_payloads(self, doc_index: int, payloads: List[TimexPayload]) -> None:
+        """1つの入力文字列から抽出したTIMEXの値を追加する
+
+        Args:
+            doc_index (int): 入力文字列のインデックス
+            payloads (List[TimexPayload]): timex_to_payload()で変換したTIMEXの値
+        """
+        columns = self.columns
+        encode = self._encode
+        for payload in payloads:
+            type_name, value, text, span, _, raw_span, _, tid, freq, quant, mod, range_start, range_end, _ = payload
+            columns["doc_index"].append(doc_index)
+            columns["tid"].append(encode(tid))
+            columns["type"].append(encode(type_name))
+            columns["value"].append(encode(value))
+            columns["text"].append(encode(text))
+            columns["span_start"].append(span[0])
+            columns["span_end"].append(span[1])
+            columns["raw_span_start"].append(raw_span[0] if raw_span else -1)
+            columns["raw_span_end"].append(raw_span[1] if raw_span else -1)
+            columns["mod"].append(encode(mod))
+            columns["freq"].append(encode(freq))
+            columns["quant"].append(encode(quant))
+            columns["range_start"].append(-1 if range_start is None else int(range_start))
+            columns["range_end"].append(-1 if range_end is None else int(range_end))
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        """列ごとに、Noneを含む値のリストに変換する
+
+        Returns:
+            Dict[str, List[Any]]: 列名と値のリスト
+        """
+        result: Dict[str, List[Any]] = {}
+        for name in self.column_names:
+            column = self.columns[name]
+            if name in self.string_columns:
+                result[name] = [self.strings[code] if code >= 0 else None for code in column]
+            elif name in self.bool_columns:
+                result[name] = [bool(flag) if flag >= 0 else None for flag in column]
+            elif name.startswith("raw_span"):
+                result[name] = [i if i >= 0 else None for i in column]
+            else:
+                result[name] = column.tolist()
+        return result
+
+    def to_arrow(self) -> Any:
+        """Apache Arrowのテーブルに変換する。文字列の列は辞書型の列とする
+
+        Raises:
+            ImportError: pyarrowがインストールされていない場合
+
+        Returns:
+            pyarrow.Table: 変換したテーブル
+        """
+        try:
+            import pyarrow as pa  # type: ignore
+        except ImportError:
+            raise ImportError("TimexColumns.to_arrow() requires pyarrow. Please install it with `pip install pyarrow`.")
+
+        dictionary = pa.array(self.strings, type=pa.string())
+        arrays = []
+        for name in self.column_names:
+            column = self.columns[name]
+            if name in self.string_columns:
+                indices = pa.array([code if code >= 0 else None for code in column], type=pa.int32())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            elif name in self.bool_columns:
+                arrays.append(pa.array([bool(flag) if flag >= 0 else None for flag in column], type=pa.bool_()))
+            elif name.startswith("raw_span"):
+                arrays.append(pa.array([i if i >= 0 else None for i in column], type=pa.int64()))
+            else:
+                arrays.append(pa.array(column, type=pa.int64()))
+        return pa.Table.from_arrays(arrays, names=list(self.column_names))
+
+
+def init_batch_worker(parser: Any) -> None:
+    """ワーカープロセスの初期化時に、TimexParserを保持する
+
+    Args:
+        parser (TimexParser): 呼び出し元から受け取ったTimexParser
+    """
+    global _worker_parser
+    _worker_parser = parser
+
+
+def parse_in_batch_worker(
+    document: Tuple[str, Optional[pendulum.DateTime]]
+) -> Tuple[List[TimexPayload], Optional[pendulum.DateTime]]:
+    """ワーカープロセスで一つの入力文字列を解析する
+
+    Args:
+        document (Tuple[str, Optional[pendulum.DateTime]]): 入力文字列と基準日時
+
+    Returns:
+        Tuple[List[TimexPayload], Optional[pendulum.DateTime]]: 抽出されたTIMEXの値と、入力された基準日時
+    """
+    text, reference = document
+    context = _worker_parser.parse_with_context(text, reference)
+    payloads = [timex_to_payload(timex, _worker_parser.pattern2index) for timex in context.timexes]
+    return payloads, reference
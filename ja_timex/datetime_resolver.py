@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+import pendulum
+from pendulum.tz.timezone import Timezone
+
+from ja_timex.tag import BaseTIMEX
+from ja_timex.util import set_timezone
+
+
+def resolve_datetimes(
+    timexes: Iterable[BaseTIMEX],
+    reference: Optional[pendulum.DateTime] = None,
+    tz: Union[str, Timezone] = "Asia/Tokyo",
+    now: Optional[pendulum.DateTime] = None,
+    errors: str = "raise",
+) -> List[Optional[datetime]]:
+    """複数のTIMEXをまとめてdatetimeに変換する
+
+    TIMEX.to_datetime()と同じ規則で変換するが、タイムゾーンの取得と現在時刻の参照は全体で一度だけ行う
+
+    Args:
+        timexes (Iterable[BaseTIMEX]): 変換するTIMEXまたはCompactTIMEX
+        reference (Optional[pendulum.DateTime], optional): すべてのTIMEXに用いる基準日時。
+            Noneの場合は各TIMEXのreferenceを用いる. Defaults to None.
+        tz (Union[str, Timezone], optional): DATEに用いるタイムゾーン. Defaults to "Asia/Tokyo".
+        now (Optional[pendulum.DateTime], optional): 年が特定できない場合に用いる現在時刻。
+            Noneの場合は呼び出し時の時刻とする. Defaults to None.
+        errors (str, optional): 存在しない日付などで変換に失敗した場合の扱い。
+            "raise"の場合は例外を送出し、"coerce"の場合はNoneとする. Defaults to "raise".
+
+    Raises:
+        ValueError: errorsが不正な場合
+
+    Returns:
+        List[Optional[datetime]]: TIMEXごとのdatetime。変換できない場合はNone
+    """
+    if errors not in ("raise", "coerce"):
+        raise ValueError(f"errors must be 'raise' or 'coerce': {errors}")
+
+    default_timezone = set_timezone(tz)
+    default_year = (now if now is not None else pendulum.now()).year
+
+    results: List[Optional[datetime]] = []
+    for timex in timexes:
+        timex_reference = reference if reference is not None else timex.reference
+        try:
+            results.append(timex.resolve_datetime(default_timezone, default_year, timex_reference))
+        except ValueError:
+            if errors == "raise":
+                raise
+            results.append(None)
+    return results
+
+
+def resolve_datetime64(
+    timexes: Iterable[BaseTIMEX],
+    reference: Optional[pendulum.DateTime] = None,
+    tz: Union[str, Timezone] = "Asia/Tokyo",
+    now: Optional[pendulum.DateTime] = None,
+    errors: str = "raise",
+) -> Tuple[Any, Any]:
+    """複数のTIMEXをまとめて、NumPyのdatetime64[s]の配列に変換する
+
+    datetimeはUTCの時刻として表し、変換できないTIMEXはNaTとする
+
+    Args:
+        timexes (Iterable[BaseTIMEX]): 変換するTIMEXまたはCompactTIMEX
+        reference (Optional[pendulum.DateTime], optional): すべてのTIMEXに用いる基準日時。
+            Noneの場合は各TIMEXのreferenceを用いる. Defaults to None.
+        tz (Union[str, Timezone], optional): DATEに用いるタイムゾーン. Defaults to "Asia/Tokyo".
+        now (Optional[pendulum.DateTime], optional): 年が特定できない場合に用いる現在時刻。
+            Noneの場合は呼び出し時の時刻とする. Defaults to None.
+        errors (str, optional): 変換に失敗した場合の扱い。"raise"または"coerce". Defaults to "raise".
+
+    Raises:
+        ImportError: numpyがインストールされていない場合
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray]: UTCのdatetime64[s]の配列と、変換できたかを表すboolの配列
+    """
+    try:
+        import numpy as np  # type: ignore
+    except ImportError:
+        raise ImportError("resolve_datetime64() requires numpy. Please install it with `pip install numpy`.")
+
+    datetimes = resolve_datetimes(timexes, reference=reference, tz=tz, now=now, errors=errors)
+    valid = np.array([dt is not None for dt in datetimes], dtype=bool)
+    values = np.array([int(dt.timestamp()) if dt is not None else 0 for dt in datetimes], dtype="int64").astype(
+        "datetime64[s]"
+    )
+    values[~valid] = np.datetime64("NaT")
+    return values, valid
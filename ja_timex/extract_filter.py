@@ -1,13 +1,28 @@
 import json
 import re
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from ja_timex.tag import Extract
 
 
 class BaseFilter(metaclass=ABCMeta):
+    """候補Extractを除外するかを判定するフィルタ
+
+    cost: 1回の判定にかかるコストの見積もり。候補の範囲の文字種のみで判定するフィルタを1.0とする
+    rejection_rate: 候補を除外する割合の見積もり
+    FilterPipelineは、これらの値から除外1件あたりのコストが小さいフィルタを先に適用する
+    config_version: 設定を変更するたびに増やす値。TimexParserは変更を検知して結果のキャッシュを区別し直す
+    """
+
+    cost: float = 1.0
+    rejection_rate: float = 0.01
+    config_version: int = 0
+
     def __init__(self) -> None:
         pass
 
@@ -15,6 +30,14 @@ class BaseFilter(metaclass=ABCMeta):
     def filter(self, extract: Extract, text: str) -> bool:
         raise NotImplementedError()
 
+    def config_key(self) -> str:
+        """結果のキャッシュにおいて、フィルタの設定を区別するための文字列
+
+        Returns:
+            str: フィルタのクラス名と設定を表す文字列
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
 
 class NumexpFilter(BaseFilter):
     """対象パターンの後に数字の単位があるかを判定する
@@ -26,21 +49,40 @@ class NumexpFilter(BaseFilter):
     e.g. "7.18に開催" に対して "7.18" というパターンを取得している場合 -> False
     """
 
+    rejection_rate = 0.005
+    re_numexp = re.compile(r"[0-9]+[\.\-\.,][0-9]+")
+
     def __init__(self, unit_path: str = "dictionary/filter_unit.json") -> None:
         with Path(__file__).parent.joinpath(unit_path).open(encoding="utf8") as f:
-            self.units = json.load(f)
+            units = json.load(f)
+
+        self.units: List[str] = []
+        self.re_unit: Optional[re.Pattern] = None
+        self.add_units(units)
+
+    def add_units(self, units: Iterable[str]) -> None:
+        """数値表現の単位を追加する
+
+        Args:
+            units (Iterable[str]): 追加する単位。正規表現として扱う
+        """
+        self.units.extend(units)
+        self.config_version += 1
+        # すべての単位を一つの正規表現にまとめ、対象パターンの終了位置から一度だけ照合する
+        self.re_unit = re.compile("\\s?(?:" + "|".join(self.units) + ")") if self.units else None
+
+    def config_key(self) -> str:
+        return "\n".join([super().config_key()] + self.units)
 
     def filter(self, extract: Extract, text: str) -> bool:
         start_i, end_i = extract.re_match.span()
 
-        target_text = text[start_i:end_i]
         # 対象としている文字列が、数字と記号の表現ではなかった場合
-        if not re.fullmatch(r"[0-9]+[\.\-\.,][0-9]+", target_text):
+        if not self.re_numexp.fullmatch(text, start_i, end_i):
             return False
 
-        for unit in self.units:
-            if re.match(f"\\s?{unit}", text[end_i:]):
-                return True
+        if self.re_unit and self.re_unit.match(text, end_i):
+            return True
         return False
 
 
@@ -54,20 +96,24 @@ class PartialNumFilter(BaseFilter):
     e.g. "これは3/13です" に対して "3/13" というパターンを取得している場合 -> False
     """
 
+    rejection_rate = 0.03
+    re_num_symbol = re.compile(r"[0-9\.\-\.,/・]+")
+    num_adjacent_chars = frozenset("0123456789+.")
+
     def __init__(self) -> None:
         pass
 
     def filter(self, extract: Extract, text: str) -> bool:
         start_i, end_i = extract.re_match.span()
 
-        target_text = text[start_i:end_i]
         # 対象としている文字列が、数字と記号の表現ではなかった場合
-        if not re.fullmatch(r"[0-9\.\-\.,/・]+", target_text):
+        # 部分文字列を作らず、候補の範囲のみを照合する
+        if not self.re_num_symbol.fullmatch(text, start_i, end_i):
             return False
 
-        if start_i != 0 and re.match(r"[0-9\+\.]", text[start_i - 1]):
+        if start_i != 0 and text[start_i - 1] in self.num_adjacent_chars:
             return True
-        elif end_i != len(text) and re.match(r"[0-9\+\.]", text[end_i]):
+        elif end_i != len(text) and text[end_i] in self.num_adjacent_chars:
             return True
         else:
             return False
@@ -80,18 +126,20 @@ class DecimalFilter(BaseFilter):
     そこで、日付表現において0および記号から始まる表現かをチェックする
     """
 
+    rejection_rate = 0.01
+    re_num_symbol = re.compile(r"[0-9\.\-,/・]+")
+
     def __init__(self) -> None:
         pass
 
     def filter(self, extract: Extract, text: str) -> bool:
         start_i, end_i = extract.re_match.span()
 
-        target_text = text[start_i:end_i]
         # 対象としている文字列が、数字と記号の表現でかつ日付表現ではなかった場合
-        if not re.fullmatch(r"[0-9\.\-,/・]+", target_text) or extract.type_name != "abstime":
+        if extract.type_name != "abstime" or not self.re_num_symbol.fullmatch(text, start_i, end_i):
             return False
 
-        if re.match(r"0[\.\-/]", target_text):
+        if end_i - start_i >= 2 and text[start_i] == "0" and text[start_i + 1] in ".-/":
             return True
         else:
             return False
@@ -117,26 +165,206 @@ class PartialPhraseFilter(BaseFilter):
     e.g. "毎日新聞によると" に対して "毎日" というパターンを取得している場合 -> True
     """
 
-    def __init__(self) -> None:
-        with Path(__file__).parent.joinpath("dictionary/partial_phrase_affix.json").open(encoding="utf8") as f:
-            self.partial_word_list = [
+    rejection_rate = 0.003
+
+    def __init__(self, dictionary_path: str = "dictionary/partial_phrase_affix.json") -> None:
+        self.partial_word_list: List[PartialPhraseAffix] = []
+        # timex_textごとに、接辞の種類と長さで分けた接辞の集合を持つ
+        # 辞書の大きさによらず、候補ごとに接辞の長さの種類数だけ照合すればよい
+        self.timex_text2affixes: Dict[str, Dict[str, Dict[int, Set[str]]]] = {}
+        self.load_dictionary(Path(__file__).parent.joinpath(dictionary_path))
+
+    def load_dictionary(self, path: Union[str, Path]) -> None:
+        """partial_phrase_affix.jsonと同じ形式の辞書ファイルから、表現を追加する
+
+        Args:
+            path (Union[str, Path]): 辞書ファイルのパス
+        """
+        with Path(path).open(encoding="utf8") as f:
+            self.add_phrases(
                 PartialPhraseAffix(timex_text=p["timex_text"], target_affix=p["target_affix"], type=p["type"])
                 for p in json.load(f)
-            ]
+            )
+
+    def add_phrases(self, partial_words: Iterable[PartialPhraseAffix]) -> None:
+        """時間情報表現を含む固有名詞や慣用表現を追加する
+
+        Args:
+            partial_words (Iterable[PartialPhraseAffix]): 追加する表現
+        """
+        for partial_word in partial_words:
+            self.partial_word_list.append(partial_word)
+            type2affixes = self.timex_text2affixes.setdefault(partial_word.timex_text, {"prefix": {}, "suffix": {}})
+            if partial_word.type in type2affixes:
+                type2affixes[partial_word.type].setdefault(partial_word.target_len, set()).add(
+                    partial_word.target_affix
+                )
+        self.config_version += 1
+
+    def config_key(self) -> str:
+        phrases = [f"{p.timex_text}\t{p.target_affix}\t{p.type}" for p in self.partial_word_list]
+        return "\n".join([super().config_key()] + phrases)
 
     def filter(self, extract: Extract, text: str) -> bool:
         start_i, end_i = extract.re_match.span()
-        target_text = text[start_i:end_i]
-
-        for partial_word in self.partial_word_list:
-            if partial_word.timex_text != target_text:
-                continue
+        type2affixes = self.timex_text2affixes.get(text[start_i:end_i])
+        if type2affixes is None:
+            return False
 
-            if partial_word.type == "prefix":
-                if text[start_i - partial_word.target_len : start_i] == partial_word.target_affix:
-                    return True
-            if partial_word.type == "suffix":
-                if text[end_i : end_i + partial_word.target_len] == partial_word.target_affix:
-                    return True
+        for target_len, affixes in type2affixes["prefix"].items():
+            if start_i >= target_len and text[start_i - target_len : start_i] in affixes:
+                return True
+        for target_len, affixes in type2affixes["suffix"].items():
+            if text[end_i : end_i + target_len] in affixes:
+                return True
 
         return False
+
+
+@dataclass
+class FilterStats:
+    """FilterPipelineで計測したフィルタごとの統計
+
+    num_calls: 判定した回数
+    num_rejections: 除外した回数
+    num_timed_calls: 処理時間を計測した回数
+    total_time: 計測した処理時間の合計(秒)
+    """
+
+    num_calls: int = 0
+    num_rejections: int = 0
+    num_timed_calls: int = 0
+    total_time: float = 0.0
+
+
+class FilterPipeline:
+    """複数のフィルタを、除外1件あたりのコストが小さい順に適用する
+
+    いずれかのフィルタが除外と判定した時点で、残りのフィルタは適用しない。
+    フィルタの順序は、cost / rejection_rateの昇順とする。
+    adaptiveがTrueの場合は、実行時に計測した処理時間と除外率によって、一定の件数ごとに順序を更新する。
+    統計の更新と順序の更新はロックで保護するため、複数のスレッドから同時に利用できる
+    """
+
+    def __init__(
+        self,
+        filters: List[BaseFilter],
+        adaptive: bool = False,
+        reorder_interval: int = 1000,
+        timing_interval: int = 16,
+        min_calls: int = 100,
+    ) -> None:
+        """FilterPipelineを初期化する
+
+        Args:
+            filters (List[BaseFilter]): 適用するフィルタ。リストへの追加や削除、置き換えはsync_filters()の呼び出し時に反映される
+            adaptive (bool, optional): 実行時の統計から順序を更新する場合はTrue. Defaults to False.
+            reorder_interval (int, optional): 順序を更新する間隔となる候補の数. Defaults to 1000.
+            timing_interval (int, optional): 処理時間を計測する間隔となる判定の回数. Defaults to 16.
+            min_calls (int, optional): 計測した統計を用いるために必要な、各フィルタの判定回数. Defaults to 100.
+        """
+        self.filters = filters
+        self.adaptive = adaptive
+        self.reorder_interval = reorder_interval
+        self.timing_interval = timing_interval
+        self.min_calls = min_calls
+
+        self.stats: Dict[int, FilterStats] = {}
+        self.ordered_filters: List[BaseFilter] = []
+        self._filter_ids: Tuple[int, ...] = ()
+        self.num_candidates = 0
+        self._lock = threading.Lock()
+        self._sync_filters()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        # 復元後はフィルタのidが変わるため、統計はフィルタの順に並べて保持する
+        state["stats"] = [self.stats.get(id(f), FilterStats()) for f in self.filters]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        filter_stats = state.pop("stats")
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.stats = {id(f): stats for f, stats in zip(self.filters, filter_stats)}
+        self._filter_ids = tuple(id(f) for f in self.filters)
+
+    def sync_filters(self) -> None:
+        """filtersのリストへの追加や削除、置き換えを反映する
+
+        候補ごとには確認しないため、TimexParserは解析ごとに一度だけ呼び出す
+        """
+        # ordered_filtersが変更前のフィルタを参照し続けるため、idが他のフィルタに再利用されることはない
+        filter_ids = tuple(id(f) for f in self.filters)
+        if filter_ids != self._filter_ids:
+            with self._lock:
+                self._sync_filters()
+
+    def _sync_filters(self) -> None:
+        """filtersの変更を反映し、宣言された値による順序に戻す"""
+        self._filter_ids = tuple(id(f) for f in self.filters)
+        self.stats = {id(f): self.stats.get(id(f), FilterStats()) for f in self.filters}
+        self.ordered_filters = sorted(self.filters, key=self._declared_rank)
+
+    @staticmethod
+    def _declared_rank(pattern_filter: BaseFilter) -> float:
+        return pattern_filter.cost / max(pattern_filter.rejection_rate, 1e-6)
+
+    def _measured_rank(self, pattern_filter: BaseFilter) -> float:
+        stats = self.stats[id(pattern_filter)]
+        mean_time = stats.total_time / stats.num_timed_calls
+        rejection_rate = stats.num_rejections / stats.num_calls
+        return mean_time / max(rejection_rate, 1e-6)
+
+    def reorder(self) -> None:
+        """計測した統計から、フィルタの順序を更新する
+
+        判定回数がmin_callsに満たないフィルタがある場合は、宣言された値による順序のままとする
+        """
+        with self._lock:
+            self._reorder()
+
+    def _reorder(self) -> None:
+        if all(
+            self.stats[id(f)].num_calls >= self.min_calls and self.stats[id(f)].num_timed_calls > 0
+            for f in self.filters
+        ):
+            self.ordered_filters = sorted(self.filters, key=self._measured_rank)
+
+    def find_rejecting_filter(self, extract: Extract, text: str) -> Optional[BaseFilter]:
+        """候補Extractを除外するフィルタを探す
+
+        Args:
+            extract (Extract): 対象のExtract
+            text (str): 入力文字列
+
+        Returns:
+            Optional[BaseFilter]: 最初に除外と判定したフィルタ。除外されない場合はNone
+        """
+        if not self.adaptive:
+            for pattern_filter in self.ordered_filters:
+                if pattern_filter.filter(extract, text):
+                    return pattern_filter
+            return None
+
+        with self._lock:
+            self.num_candidates += 1
+            if self.num_candidates % self.reorder_interval == 0:
+                self._reorder()
+
+            for pattern_filter in self.ordered_filters:
+                stats = self.stats[id(pattern_filter)]
+                stats.num_calls += 1
+                if (stats.num_calls - 1) % self.timing_interval == 0:
+                    start_time = time.perf_counter()
+                    is_rejected = pattern_filter.filter(extract, text)
+                    stats.total_time += time.perf_counter() - start_time
+                    stats.num_timed_calls += 1
+                else:
+                    is_rejected = pattern_filter.filter(extract, text)
+
+                if is_rejected:
+                    stats.num_rejections += 1
+                    return pattern_filter
+            return None
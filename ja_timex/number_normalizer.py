@@ -1,6 +1,8 @@
 import re
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Set, Tuple
 
 import mojimoji
 
@@ -9,6 +11,7 @@ char2int = {"〇": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6
 char2power_allow_head = {"十": 1, "百": 2, "千": 3}
 char2power = {"万": 4, "億": 8, "兆": 12, "京": 16, "垓": 20}
 char_int_table = str.maketrans({k: str(v) for k, v in char2int.items()})
+zenkaku_digits = "０１２３４５６７８９"
 
 
 @dataclass
@@ -23,25 +26,145 @@ class IgnorePhrase:
     relative_position_to_ref: Tuple[int, int]
 
 
-@dataclass
-class DiffIndex:
-    """漢数字やコンマなどを対象にした文字列の正規化によって生まれたインデックスの差
+class OffsetMap:
+    """漢数字やコンマなどを対象にした文字列の正規化による、正規化前後のインデックスの対応
 
-    aabbbbcc (before)
+    aabbbbcc (raw)
     ↓
-    aabbbcc  (after)
+    aabbbcc  (processed)
       ↑ here
 
-    index: 正規化によって差が生まれた置換文字列の開始位置
-    diff: インデックスの差異
+    長さが変化した置換箇所のみを、正規化前後それぞれの開始位置と終了位置の配列として保持する。
+    置換箇所の外側のインデックスは、直前の置換箇所からの距離によって対応付ける
     """
 
-    index: int
-    diff: int
+    def __init__(self) -> None:
+        self.raw_starts = array("q")
+        self.raw_ends = array("q")
+        self.processed_starts = array("q")
+        self.processed_ends = array("q")
+
+    def __len__(self) -> int:
+        return len(self.raw_starts)
 
+    def add(self, raw_start_i: int, raw_end_i: int, processed_start_i: int, processed_end_i: int) -> None:
+        """置換箇所を追加する。置換箇所は文字列の先頭から順に追加する
 
-def kansuji2number(text: str) -> str:
+        Args:
+            raw_start_i (int): 正規化前の文字列における置換箇所の開始位置
+            raw_end_i (int): 正規化前の文字列における置換箇所の終了位置
+            processed_start_i (int): 正規化後の文字列における置換箇所の開始位置
+            processed_end_i (int): 正規化後の文字列における置換箇所の終了位置
+        """
+        self.raw_starts.append(raw_start_i)
+        self.raw_ends.append(raw_end_i)
+        self.processed_starts.append(processed_start_i)
+        self.processed_ends.append(processed_end_i)
+
+    def to_raw(self, processed_i: int, is_end: bool = False) -> int:
+        """正規化後の文字列のインデックスを、正規化前の文字列のインデックスに変換する
+
+        Args:
+            processed_i (int): 正規化後の文字列のインデックス
+            is_end (bool, optional): 範囲の終了位置として変換する場合はTrue。
+                置換箇所の途中を指す場合に、置換箇所の終了位置を返す. Defaults to False.
+
+        Returns:
+            int: 正規化前の文字列のインデックス
+        """
+        return self._convert(
+            processed_i, is_end, self.processed_starts, self.processed_ends, self.raw_starts, self.raw_ends
+        )
+
+    def to_processed(self, raw_i: int, is_end: bool = False) -> int:
+        """正規化前の文字列のインデックスを、正規化後の文字列のインデックスに変換する
+
+        Args:
+            raw_i (int): 正規化前の文字列のインデックス
+            is_end (bool, optional): 範囲の終了位置として変換する場合はTrue。
+                置換箇所の途中を指す場合に、置換箇所の終了位置を返す. Defaults to False.
+
+        Returns:
+            int: 正規化後の文字列のインデックス
+        """
+        return self._convert(raw_i, is_end, self.raw_starts, self.raw_ends, self.processed_starts, self.processed_ends)
+
+    def to_raw_span(self, processed_span: Tuple[int, int]) -> Tuple[int, int]:
+        """正規化後の文字列の範囲を、正規化前の文字列の範囲に変換する
+
+        Args:
+            processed_span (Tuple[int, int]): 正規化後の文字列の開始位置と終了位置
+
+        Returns:
+            Tuple[int, int]: 正規化前の文字列の開始位置と終了位置
+        """
+        return self.to_raw(processed_span[0]), self.to_raw(processed_span[1], is_end=True)
+
+    @staticmethod
+    def _convert(i: int, is_end: bool, src_starts: array, src_ends: array, dst_starts: array, dst_ends: array) -> int:
+        # iより前で始まる最後の置換箇所を基準にする
+        k = bisect_right(src_starts, i) - 1
+        if k < 0:
+            return i
+        if i == src_starts[k]:
+            return dst_starts[k]
+        if i < src_ends[k]:
+            return dst_ends[k] if is_end else dst_starts[k]
+        return dst_ends[k] + i - src_ends[k]
+
+    @classmethod
+    def compose(cls, first: "OffsetMap", second: "OffsetMap") -> "OffsetMap":
+        """2段階の正規化のOffsetMapを合成する
+
+        Args:
+            first (OffsetMap): 1段階目の正規化による、入力文字列と中間の文字列の対応
+            second (OffsetMap): 2段階目の正規化による、中間の文字列と出力文字列の対応
+
+        Returns:
+            OffsetMap: 入力文字列と出力文字列の対応
+        """
+        if not first:
+            return second
+        if not second:
+            return first
+
+        # (processed_start_i, processed_end_i, raw_start_i, raw_end_i)
+        segments = []
+        for k in range(len(first)):
+            segments.append(
+                (
+                    second.to_processed(first.processed_starts[k]),
+                    second.to_processed(first.processed_ends[k], is_end=True),
+                    first.raw_starts[k],
+                    first.raw_ends[k],
+                )
+            )
+        for k in range(len(second)):
+            segments.append(
+                (
+                    second.processed_starts[k],
+                    second.processed_ends[k],
+                    first.to_raw(second.raw_starts[k]),
+                    first.to_raw(second.raw_ends[k], is_end=True),
+                )
+            )
+        segments.sort()
+
+        # 重なり合う置換箇所は一つにまとめる
+        offset_map = cls()
+        current = list(segments[0])
+        for processed_start_i, processed_end_i, raw_start_i, raw_end_i in segments[1:]:
+            if processed_start_i < current[1] or raw_start_i < current[3]:
+                current[1] = max(current[1], processed_end_i)
+                current[3] = max(current[3], raw_end_i)
+            else:
+                offset_map.add(current[2], current[3], current[0], current[1])
+                current = [processed_start_i, processed_end_i, raw_start_i, raw_end_i]
+        offset_map.add(current[2], current[3], current[0], current[1])
+        return offset_map
 
+
+def kansuji2number(text: str) -> str:
     if text == "零":
         return "0"
 
@@ -103,7 +226,7 @@ class NumberNormalizer:
             ],
         }
         self.ignore_kansuji = False
-        self.diff_index_list: List[DiffIndex] = []
+        self.offset_map = OffsetMap()
 
     def set_ignore_kansuji(self, ignore_kansuji: bool) -> None:
         """漢数字を変換しないかのパラメータをセットする
@@ -113,15 +236,53 @@ class NumberNormalizer:
         """
         self.ignore_kansuji = ignore_kansuji
 
+    def get_source_chars(self, chars: Iterable[str]) -> Set[str]:
+        """正規化後の文字列に含まれる文字から、正規化前の文字列でそれらの文字になりうる文字を求める
+
+        e.g. {"1", "年"} -> {"1", "１", "一", "十", ..., "年"}
+
+        Args:
+            chars (Iterable[str]): 正規化後の文字列に含まれる文字
+
+        Returns:
+            Set[str]: 正規化前の文字列に含まれうる文字
+        """
+        source_chars = set(chars)
+        if any(char.isdigit() for char in chars):
+            source_chars |= set(zenkaku_digits)
+            # 漢数字は一つの文字が複数桁の数字になりうるため、どの数字に対しても追加する
+            source_chars |= set(char2int) | set(char2power_allow_head) | set(char2power)
+        if "," in source_chars:
+            source_chars.add("，")
+        if "." in source_chars:
+            source_chars.add("．")
+        return source_chars
+
     def normalize(self, text: str) -> str:
-        self.diff_index_list = []
+        text, self.offset_map = self.normalize_with_offset_map(text)
+        return text
+
+    def normalize_with_offset_map(self, text: str) -> Tuple[str, OffsetMap]:
+        """数字の表記を正規化し、正規化前後のインデックスの対応とともに返す
+
+        normalize()とは異なりインスタンスの状態を変更しないため、複数のスレッドから同時に呼び出すことができる
 
+        Args:
+            text (str): 入力文字列
+
+        Returns:
+            Tuple[str, OffsetMap]: 正規化した文字列と、正規化前後のインデックスの対応
+        """
+        # 全角から半角への変換は文字列の長さを変えない
         text = self._normalize_zen_to_han(text)
+
+        kansuji_offset_map = OffsetMap()
         if not self.ignore_kansuji:
-            text = self._normalize_kansuji(text)
-        text = self._remove_comma_inside_digits(text)
+            text = self._normalize_kansuji(text, kansuji_offset_map)
+        comma_offset_map = OffsetMap()
+        text = self._remove_comma_inside_digits(text, comma_offset_map)
 
-        return text
+        return text, OffsetMap.compose(kansuji_offset_map, comma_offset_map)
 
     def _normalize_zen_to_han(self, text: str) -> str:
         """半角数字に正規化する
@@ -137,27 +298,23 @@ class NumberNormalizer:
         text = mojimoji.zen_to_han(text, kana=False, ascii=False)
 
         # 数字の間にはいる,や.の全角文字を半角にする
-        re_match = re.search("[0-9][，．][0-9]", text)
-        if re_match:
-            number_start_i, number_end_i = re_match.span()
-            replaced_text = re_match.group().replace("，", ",").replace("．", ".")
-            text = text[:number_start_i] + replaced_text + text[number_end_i:]
+        return re.sub("(?<=[0-9])[，．](?=[0-9])", lambda m: "," if m.group() == "，" else ".", text)
 
-        return text
-
-    def _normalize_kansuji(self, text: str) -> str:
+    def _normalize_kansuji(self, text: str, offset_map: Optional[OffsetMap] = None) -> str:
         """漢数字をアラビア数字に正規化する
 
         Args:
             text (str): 入力文字列
+            offset_map (Optional[OffsetMap], optional): 正規化前後のインデックスの対応を記録する. Defaults to None.
 
         Returns:
             [str]: アラビア数字に正規化した文字列
         """
-        re_matches = list(re.finditer("[〇一二三四五六七八九十百千万億兆京垓]+", text))
-        for re_iter in reversed(re_matches):
+        pieces: List[str] = []
+        last_end_i = 0
+        processed_len = 0
+        for re_iter in re.finditer("[〇一二三四五六七八九十百千万億兆京垓]+", text):
             start_i, end_i = re_iter.span()
-            replaced_text = kansuji2number(re_iter.group())
 
             # 慣用句などの無視すべき表現をチェックする
             should_ignore = False
@@ -173,36 +330,69 @@ class NumberNormalizer:
                 should_ignore = True
 
             if not should_ignore:
-                text = text[:start_i] + replaced_text + text[end_i:]
-                self._set_diff_index(start_i, end_i, len(replaced_text))
-        return text
+                replaced_text = kansuji2number(re_iter.group())
+                processed_len = self._append_replaced_text(
+                    pieces, text[last_end_i:start_i], replaced_text, start_i, end_i, processed_len, offset_map
+                )
+                last_end_i = end_i
+
+        pieces.append(text[last_end_i:])
+        return "".join(pieces)
 
-    def _remove_comma_inside_digits(self, text: str) -> str:
+    def _remove_comma_inside_digits(self, text: str, offset_map: Optional[OffsetMap] = None) -> str:
         """可読性のために挿入されるカンマを削除する
 
         Args:
             text (str): 入力文字列
+            offset_map (Optional[OffsetMap], optional): 正規化前後のインデックスの対応を記録する. Defaults to None.
 
         Returns:
             str: カンマを削除した文字列
         """
-        re_matches = list(re.finditer("(([0-9]{1,3}(,[0-9]{3})*)(?![0-9]))", text))
-        for re_match in reversed(re_matches):
+        pieces: List[str] = []
+        last_end_i = 0
+        processed_len = 0
+        for re_match in re.finditer("(([0-9]{1,3}(,[0-9]{3})*)(?![0-9]))", text):
+            if "," not in re_match.group():
+                continue
             start_i, end_i = re_match.span()
             replaced_text = re_match.group().replace(",", "")
-            text = text[:start_i] + replaced_text + text[end_i:]
-            self._set_diff_index(start_i, end_i, len(replaced_text))
-        else:
-            return text
-
-    def _set_diff_index(self, start_i: int, end_i: int, len_replace_text: int) -> None:
-        """正規化により文字列の長さに差が出た箇所を記録
+            processed_len = self._append_replaced_text(
+                pieces, text[last_end_i:start_i], replaced_text, start_i, end_i, processed_len, offset_map
+            )
+            last_end_i = end_i
+
+        pieces.append(text[last_end_i:])
+        return "".join(pieces)
+
+    def _append_replaced_text(
+        self,
+        pieces: List[str],
+        unchanged_text: str,
+        replaced_text: str,
+        start_i: int,
+        end_i: int,
+        processed_len: int,
+        offset_map: Optional[OffsetMap],
+    ) -> int:
+        """置換箇所とその直前の文字列を出力に追加し、長さが変わる場合は置換箇所を記録する
 
         Args:
-            start_i (int): 正規化文字列の開始位置
-            end_i (int): 正規化文字列の終了位置
-            len_replace_text (int): 正規化文字列長
+            pieces (List[str]): 出力文字列の断片のリスト
+            unchanged_text (str): 直前の置換箇所から、この置換箇所までの文字列
+            replaced_text (str): 置換後の文字列
+            start_i (int): 正規化前の文字列における置換箇所の開始位置
+            end_i (int): 正規化前の文字列における置換箇所の終了位置
+            processed_len (int): これまでに出力した文字列の長さ
+            offset_map (Optional[OffsetMap]): 正規化前後のインデックスの対応。Noneの場合は記録しない
+
+        Returns:
+            int: 置換箇所を追加した後の出力文字列の長さ
         """
-        diff_index = end_i - start_i - len_replace_text
-        if diff_index != 0:
-            self.diff_index_list.append(DiffIndex(start_i, diff_index))
+        pieces.append(unchanged_text)
+        pieces.append(replaced_text)
+        processed_start_i = processed_len + len(unchanged_text)
+        processed_end_i = processed_start_i + len(replaced_text)
+        if offset_map is not None and end_i - start_i != len(replaced_text):
+            offset_map.add(start_i, end_i, processed_start_i, processed_end_i)
+        return processed_end_i
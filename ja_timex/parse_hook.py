@@ -0,0 +1,85 @@
+import time
+from abc import ABCMeta, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import DefaultDict, Dict
+
+
+@dataclass
+class ParseStats:
+    """1回の解析における各段階の処理時間と件数
+
+    text_length: 入力文字列の長さ
+    stage_times: 段階ごとの処理時間(秒)
+        normalize, extract, extract_filter, drop_duplicates, parse, post_process, adjust_index
+        フィルタと重複除去は1回の走査で行うため、extract_filterはフィルタの判定時間の合計とし、
+        drop_duplicatesはその走査のうちフィルタ以外の時間とする
+    num_extracts: 抽出された候補Extractの数
+    num_filtered: フィルタのクラス名ごとの、候補Extractを除外した数
+    num_dropped: 重複などにより除外された候補Extractの数。採用済みの候補と重なる候補はフィルタを適用せずに除外される
+    num_timexes: 出力されたTIMEXの数
+    """
+
+    text_length: int = 0
+    stage_times: Dict[str, float] = field(default_factory=dict)
+    num_extracts: int = 0
+    num_filtered: DefaultDict[str, int] = field(default_factory=lambda: defaultdict(int))
+    num_dropped: int = 0
+    num_timexes: int = 0
+
+    def record_stage(self, stage: str, start_time: float) -> float:
+        """start_timeからの経過時間を段階の処理時間として記録する
+
+        Args:
+            stage (str): 段階の名前
+            start_time (float): 段階の開始時刻
+
+        Returns:
+            float: 次の段階の開始時刻とする、現在の時刻
+        """
+        now = time.perf_counter()
+        self.stage_times[stage] = now - start_time
+        return now
+
+    def add_stage_time(self, stage: str, elapsed: float) -> None:
+        """他の段階と交互に行われる段階の処理時間を累積する
+
+        Args:
+            stage (str): 段階の名前
+            elapsed (float): 加算する処理時間(秒)
+        """
+        self.stage_times[stage] = self.stage_times.get(stage, 0.0) + elapsed
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.stage_times.values())
+
+
+class BaseParseHook(metaclass=ABCMeta):
+    """TimexParserの解析ごとに、ParseStatsを受け取るフック
+
+    should_record()がFalseを返した解析では計測を行わないため、一部の解析のみをサンプリングできる
+
+    e.g.
+        class SamplingHook(BaseParseHook):
+            def should_record(self, raw_text: str) -> bool:
+                return random.random() < 0.01
+
+            def on_parse(self, stats: ParseStats) -> None:
+                metrics.send(stats.stage_times)
+    """
+
+    def should_record(self, raw_text: str) -> bool:
+        """この解析を計測するかを判定する
+
+        Args:
+            raw_text (str): 入力文字列
+
+        Returns:
+            bool: 計測する場合はTrue
+        """
+        return True
+
+    @abstractmethod
+    def on_parse(self, stats: ParseStats) -> None:
+        raise NotImplementedError()
@@ -1,20 +1,87 @@
 import json
 import re
+import threading
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Dict, List
 
 weekday2id = {"月": "1", "火": "2", "水": "3", "木": "4", "金": "5", "土": "6", "日": "7"}
 season2id = {"春": "SP", "夏": "SU", "秋": "FA", "冬": "WI"}
 with Path(__file__).parent.parent.joinpath("dictionary/wareki.json").open(encoding="utf8") as f:
     wareki2year = json.load(f)
 
+# 同一の正規表現の文字列に対して、コンパイル済みの正規表現を共有するためのレジストリ
+compiled_pattern_registry: Dict[str, re.Pattern] = {}
+
+
+def compile_pattern(re_pattern: str) -> re.Pattern:
+    """正規表現をコンパイルし、レジストリに登録する
+
+    reモジュールのキャッシュは上限があり、パターン数が多い場合に再コンパイルが発生するため、
+    コンパイル済みの正規表現をレジストリで保持して使い回す
+
+    Args:
+        re_pattern (str): 正規表現の文字列
+
+    Returns:
+        re.Pattern: コンパイル済みの正規表現
+    """
+    re_compiled = compiled_pattern_registry.get(re_pattern)
+    if re_compiled is None:
+        re_compiled = compiled_pattern_registry.setdefault(re_pattern, re.compile(re_pattern))
+    return re_compiled
+
 
 class Pattern:
+    # CompactTIMEXなどからPatternを整数のidで参照するための登録簿
+    # idは登録したプロセス内でのみ有効で、登録したPatternは解放されない
+    _registry: List["Pattern"] = []
+    _registry_ids: Dict[int, int] = {}
+    _registry_lock = threading.Lock()
+
     def __init__(self, re_pattern, parse_func, option=None) -> None:
         self.re_pattern = re_pattern
+        self.re_compiled = compile_pattern(re_pattern) if re_pattern is not None else None
         self.parse_func = parse_func
         self.option = option
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # コンパイル済みの正規表現は、復元時にレジストリから取得する
+        state = self.__dict__.copy()
+        state.pop("re_compiled", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.re_compiled = compile_pattern(self.re_pattern) if self.re_pattern is not None else None
+
+    def register(self) -> int:
+        """Patternを登録簿に登録し、そのidを返す。登録済みの場合は同じidを返す
+
+        Returns:
+            int: Patternのid
+        """
+        pattern_id = Pattern._registry_ids.get(id(self))
+        if pattern_id is None:
+            with Pattern._registry_lock:
+                pattern_id = Pattern._registry_ids.get(id(self))
+                if pattern_id is None:
+                    pattern_id = Pattern._registry_ids[id(self)] = len(Pattern._registry)
+                    Pattern._registry.append(self)
+        return pattern_id
+
+    @staticmethod
+    def from_registered_id(pattern_id: int) -> "Pattern":
+        """register()で得たidから、登録されたPatternを取得する
+
+        Args:
+            pattern_id (int): Patternのid
+
+        Returns:
+            Pattern: 登録されたPattern
+        """
+        return Pattern._registry[pattern_id]
+
     def __repr__(self) -> str:
         return f"<Pattern: {self.re_pattern} / parse_func:{self.parse_func.__name__} / option:{self.option}>"
 
@@ -97,8 +164,8 @@ class Place:
 
     def is_valid(self, target, text):
         # for tests
-        re_pattern = getattr(self, target)
-        if re.fullmatch(re_pattern, text):
+        re_compiled = compile_pattern(getattr(self, target))
+        if re_compiled.fullmatch(text):
             return True
         else:
             return False
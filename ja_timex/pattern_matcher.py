@@ -0,0 +1,442 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import DefaultDict, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from ja_timex.pattern.place import Pattern, compile_pattern
+
+try:
+    from re import _constants as sre_constants  # type: ignore
+    from re import _parser as sre_parse  # type: ignore
+except ImportError:  # Python 3.10以前
+    import sre_constants  # type: ignore
+    import sre_parse  # type: ignore
+
+# 文字範囲を先頭文字の集合として展開する際の上限
+MAX_RANGE_CHARS = 256
+
+
+def _first_chars_of_items(items) -> Tuple[Optional[Set[str]], bool]:
+    """正規表現の構文木の要素列から、マッチの先頭になりうる文字の集合を求める
+
+    Args:
+        items: sre_parseによる構文木の要素列
+
+    Returns:
+        Tuple[Optional[Set[str]], bool]: 先頭文字の集合(特定できない場合はNone)と、空文字列にマッチしうるか
+    """
+    first_chars: Set[str] = set()
+    for op, av in items:
+        chars, nullable = _first_chars_of_op(op, av)
+        if chars is None:
+            return None, False
+        first_chars |= chars
+        if not nullable:
+            return first_chars, False
+    return first_chars, True
+
+
+def _first_chars_of_op(op, av) -> Tuple[Optional[Set[str]], bool]:
+    if op is sre_constants.LITERAL:
+        return {chr(av)}, False
+    elif op is sre_constants.IN:
+        chars = set()
+        for in_op, in_av in av:
+            if in_op is sre_constants.LITERAL:
+                chars.add(chr(in_av))
+            elif in_op is sre_constants.RANGE and in_av[1] - in_av[0] < MAX_RANGE_CHARS:
+                chars |= {chr(c) for c in range(in_av[0], in_av[1] + 1)}
+            else:
+                # NEGATEやCATEGORY(\sや\dなど)は集合として列挙しない
+                return None, False
+        return chars, False
+    elif op is sre_constants.SUBPATTERN:
+        _, add_flags, _, sub_items = av
+        if add_flags & re.IGNORECASE:
+            return None, False
+        return _first_chars_of_items(sub_items)
+    elif op is sre_constants.BRANCH:
+        chars = set()
+        nullable = False
+        for branch_items in av[1]:
+            branch_chars, branch_nullable = _first_chars_of_items(branch_items)
+            if branch_chars is None:
+                return None, False
+            chars |= branch_chars
+            nullable = nullable or branch_nullable
+        return chars, nullable
+    elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        min_repeat, _, sub_items = av
+        repeat_chars, repeat_nullable = _first_chars_of_items(sub_items)
+        if repeat_chars is None:
+            return None, False
+        return repeat_chars, repeat_nullable or min_repeat == 0
+    elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        # 文字を消費しない
+        return set(), True
+    return None, False
+
+
+def _has_group_reference(items) -> bool:
+    for op, av in items:
+        if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return True
+        sub_items_list = []
+        if op is sre_constants.SUBPATTERN:
+            sub_items_list = [av[3]]
+        elif op is sre_constants.BRANCH:
+            sub_items_list = av[1]
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            sub_items_list = [av[2]]
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            sub_items_list = [av[1]]
+        if any(_has_group_reference(sub_items) for sub_items in sub_items_list):
+            return True
+    return False
+
+
+def _required_chars_of_items(items) -> Optional[FrozenSet[str]]:
+    """正規表現の構文木の要素列から、マッチに必ず含まれる文字の集合を求める
+
+    要素列の中で必須となる文字の集合が複数ある場合は、数字やASCII文字を含まず、かつ要素数の少ないものを選ぶ
+
+    Args:
+        items: sre_parseによる構文木の要素列
+
+    Returns:
+        Optional[FrozenSet[str]]: マッチに少なくとも一つは含まれる文字の集合。特定できない場合はNone
+    """
+    candidates = [_required_chars_of_op(op, av) for op, av in items]
+    return min(
+        [chars for chars in candidates if chars],
+        key=lambda chars: (any(char.isascii() for char in chars), len(chars)),
+        default=None,
+    )
+
+
+def _required_chars_of_op(op, av) -> Optional[FrozenSet[str]]:
+    if op in (sre_constants.LITERAL, sre_constants.IN):
+        chars, _ = _first_chars_of_op(op, av)
+        return frozenset(chars) if chars is not None else None
+    elif op is sre_constants.SUBPATTERN:
+        _, add_flags, _, sub_items = av
+        if add_flags & re.IGNORECASE:
+            return None
+        return _required_chars_of_items(sub_items)
+    elif op is sre_constants.BRANCH:
+        required_chars: Set[str] = set()
+        for branch_items in av[1]:
+            branch_chars = _required_chars_of_items(branch_items)
+            if branch_chars is None:
+                return None
+            required_chars |= branch_chars
+        return frozenset(required_chars)
+    elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        min_repeat, _, sub_items = av
+        if min_repeat == 0:
+            return None
+        return _required_chars_of_items(sub_items)
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_required_chars(re_pattern: str) -> Optional[FrozenSet[str]]:
+    """正規表現のマッチに必ず含まれる文字の集合を取得する
+
+    e.g. "(?P<calendar_year>[0-9]{1,4})年" -> {"年"}
+    e.g. "(?P<before_suffix>(前|まえ))" -> {"前", "ま"}
+
+    Args:
+        re_pattern (str): 正規表現のパターン
+
+    Returns:
+        Optional[FrozenSet[str]]: マッチに少なくとも一つは含まれる文字の集合。特定できない場合はNone
+    """
+    parsed = sre_parse.parse(re_pattern)
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    return _required_chars_of_items(parsed)
+
+
+@lru_cache(maxsize=None)
+def get_first_chars(re_pattern: str) -> Optional[FrozenSet[str]]:
+    """正規表現のマッチの先頭になりうる文字の集合を取得する
+
+    Args:
+        re_pattern (str): 正規表現のパターン
+
+    Returns:
+        Optional[FrozenSet[str]]: 先頭文字の集合。空文字列にマッチしうる場合や、集合を特定できない場合、
+            グローバルなフラグを持つ場合はNone
+    """
+    parsed = sre_parse.parse(re_pattern)
+    # (?s)や(?m)などのグローバルなフラグを持つパターンは、他のパターンとまとめて一つの正規表現にできない
+    if parsed.state.flags & ~re.UNICODE or _has_group_reference(parsed):
+        return None
+
+    first_chars, nullable = _first_chars_of_items(parsed)
+    if first_chars is None or nullable:
+        return None
+    return frozenset(first_chars)
+
+
+def to_non_capturing(re_pattern: str) -> str:
+    """正規表現中のすべてのグループを非キャプチャグループに変換する
+
+    Args:
+        re_pattern (str): 正規表現のパターン
+
+    Returns:
+        str: キャプチャグループを含まない正規表現のパターン
+    """
+    result = []
+    i = 0
+    in_class = False
+    while i < len(re_pattern):
+        char = re_pattern[i]
+        if char == "\\":
+            result.append(re_pattern[i : i + 2])
+            i += 2
+            continue
+
+        if in_class:
+            if char == "]":
+                in_class = False
+        elif char == "[":
+            in_class = True
+            # 文字クラス先頭の"^"や"]"はそのまま残す
+            head_end_i = i + 1
+            if re_pattern[head_end_i : head_end_i + 1] == "^":
+                head_end_i += 1
+            if re_pattern[head_end_i : head_end_i + 1] == "]":
+                head_end_i += 1
+            result.append(re_pattern[i:head_end_i])
+            i = head_end_i
+            continue
+        elif char == "(":
+            if re_pattern.startswith("(?P<", i):
+                result.append("(?:")
+                i = re_pattern.index(">", i) + 1
+                continue
+            elif not re_pattern.startswith("(?", i):
+                result.append("(?:")
+                i += 1
+                continue
+
+        result.append(char)
+        i += 1
+    return "".join(result)
+
+
+class _PatternScanner:
+    """先頭文字ごとにまとめた正規表現を用いて、複数のPatternのマッチの開始位置を求める
+
+    各Patternの先頭になりうる文字を事前に求めておき、文字列の走査は先頭文字の出現位置を求める一度だけとする。
+    各出現位置ではその文字から始まりうるPatternをまとめた正規表現を一度だけ適用して、
+    どのPatternがどこまでマッチするかを判定する
+    """
+
+    def __init__(self, patterns: List[Pattern], pattern_ids: List[int]) -> None:
+        self.patterns = patterns
+
+        char2pattern_ids: DefaultDict[str, List[int]] = defaultdict(list)
+        for pattern_i in pattern_ids:
+            first_chars = get_first_chars(patterns[pattern_i].re_pattern)
+            if first_chars is None:
+                raise ValueError(f"first chars of {patterns[pattern_i]} can not be determined")
+            for char in first_chars:
+                char2pattern_ids[char].append(pattern_i)
+
+        # 同じPatternの組み合わせを持つ先頭文字どうしで、まとめた正規表現を共有する
+        self._char2dispatch: Dict[str, Tuple[re.Pattern, Tuple[int, ...]]] = {}
+        pattern_ids2dispatch: Dict[Tuple[int, ...], Tuple[re.Pattern, Tuple[int, ...]]] = {}
+        for char, pattern_id_list in char2pattern_ids.items():
+            dispatch_pattern_ids = tuple(sorted(pattern_id_list))
+            if dispatch_pattern_ids not in pattern_ids2dispatch:
+                pattern_ids2dispatch[dispatch_pattern_ids] = (
+                    self._compile_dispatch(dispatch_pattern_ids),
+                    dispatch_pattern_ids,
+                )
+            self._char2dispatch[char] = pattern_ids2dispatch[dispatch_pattern_ids]
+
+        self._re_first_char: Optional[re.Pattern] = None
+        if self._char2dispatch:
+            char_class = "".join(re.escape(char) for char in sorted(self._char2dispatch))
+            self._re_first_char = re.compile(f"[{char_class}]")
+
+    def _compile_dispatch(self, pattern_ids: Tuple[int, ...]) -> re.Pattern:
+        """複数のPatternを、同じ位置からそれぞれのマッチ範囲を取得できる一つの正規表現にまとめる
+
+        各Patternを肯定先読みのキャプチャグループで囲むことで、文字を消費せずにすべてのPatternを同じ位置で評価する。
+        i番目のグループの終了位置がpattern_ids[i]のPatternのマッチの終了位置となる
+
+        Args:
+            pattern_ids (Tuple[int, ...]): まとめる対象のPatternのインデックス
+
+        Returns:
+            re.Pattern: まとめられた正規表現
+        """
+        dispatch_pattern = "".join(f"(?:(?=({to_non_capturing(self.patterns[i].re_pattern)}))|)" for i in pattern_ids)
+        return compile_pattern(dispatch_pattern)
+
+    def scan(
+        self, text: str, pattern_id2starts: List[List[int]], pattern_id2ends: List[List[int]], next_start_i: List[int]
+    ) -> None:
+        """文字列を走査して、Patternごとのマッチの開始位置と終了位置をpattern_id2starts, pattern_id2endsに追加する
+
+        re.finditer()と同様に、同一Patternのマッチどうしは重ならないようにする
+
+        Args:
+            text (str): 入力文字列
+            pattern_id2starts (List[List[int]]): Patternごとのマッチの開始位置
+            pattern_id2ends (List[List[int]]): Patternごとのマッチの終了位置
+            next_start_i (List[int]): Patternごとの次のマッチが開始できる位置
+        """
+        if not self._re_first_char:
+            return
+
+        char2dispatch = self._char2dispatch
+        for re_first_char in self._re_first_char.finditer(text):
+            start_i = re_first_char.start()
+            re_dispatch, pattern_ids = char2dispatch[text[start_i]]
+            re_dispatch_match = re_dispatch.match(text, start_i)
+            if re_dispatch_match is None or re_dispatch_match.lastindex is None:
+                continue
+            for pattern_i, (_, end_i) in zip(pattern_ids, re_dispatch_match.regs[1:]):
+                if end_i >= 0 and next_start_i[pattern_i] <= start_i:
+                    pattern_id2starts[pattern_i].append(start_i)
+                    pattern_id2ends[pattern_i].append(end_i)
+                    next_start_i[pattern_i] = end_i
+
+
+class MultiPatternMatcher:
+    """複数のPatternを文字列から一括で検出する
+
+    Patternごとに文字列全体をre.finditer()で走査する代わりに、先頭文字ごとにまとめた正規表現を用いて一度の走査で検出する。
+    また、各Patternのマッチに必ず含まれる文字(年や月、時など)を事前に求めて索引を作っておき、
+    その文字が入力文字列に含まれないPatternは適用しない。
+
+    Patternごとにre.finditer()を適用した場合と同一のマッチの範囲を、同一の順序で返す。
+    """
+
+    def __init__(self, patterns: List[Pattern]) -> None:
+        self.patterns = patterns
+        # 走査に用いたものと同じ正規表現でマッチを求め直せるよう、構築時の正規表現を保持する
+        self.compiled_patterns = [compile_pattern(pattern.re_pattern) for pattern in patterns]
+
+        # 先頭文字を特定できないPatternは、個別にre.finditer()を適用する
+        self._fallback_pattern_ids = {
+            pattern_i for pattern_i, pattern in enumerate(patterns) if get_first_chars(pattern.re_pattern) is None
+        }
+        scan_pattern_ids = [
+            pattern_i for pattern_i in range(len(patterns)) if pattern_i not in self._fallback_pattern_ids
+        ]
+        self._full_scanner = _PatternScanner(patterns, scan_pattern_ids)
+
+        # マッチに必ず含まれる文字が同じPatternどうしをグループにまとめ、文字からグループへの索引を作る
+        # 必須の文字を特定できないPatternは、常に適用するグループに含める
+        required_chars2group_i: Dict[Optional[FrozenSet[str]], int] = {}
+        group_pattern_ids: List[List[int]] = []
+        self._pattern_id2group_i: List[int] = []
+        for pattern in patterns:
+            required_chars = get_required_chars(pattern.re_pattern)
+            if required_chars not in required_chars2group_i:
+                required_chars2group_i[required_chars] = len(group_pattern_ids)
+                group_pattern_ids.append([])
+            group_i = required_chars2group_i[required_chars]
+            group_pattern_ids[group_i].append(len(self._pattern_id2group_i))
+            self._pattern_id2group_i.append(group_i)
+
+        self._char2group_ids: DefaultDict[str, Set[int]] = defaultdict(set)
+        self._always_group_ids: Set[int] = set()
+        for required_chars, group_i in required_chars2group_i.items():
+            if required_chars is None:
+                self._always_group_ids.add(group_i)
+                continue
+            for char in required_chars:
+                self._char2group_ids[char].add(group_i)
+        self.trigger_chars = frozenset(self._char2group_ids)
+        # すべてのPatternが必須の文字を持つ場合は、trigger_charsを含まない文字列からは何も検出されない
+        self.requires_trigger = not self._always_group_ids
+
+        self._group_scanners = [
+            _PatternScanner(patterns, [i for i in pattern_ids if i not in self._fallback_pattern_ids])
+            for pattern_ids in group_pattern_ids
+        ]
+
+    def get_enabled_group_ids(self, text_chars: Set[str]) -> Set[int]:
+        """入力文字列に含まれる文字から、適用が必要なPatternのグループを取得する
+
+        Args:
+            text_chars (Set[str]): 入力文字列に含まれる文字の集合
+
+        Returns:
+            Set[int]: 適用が必要なグループのインデックス
+        """
+        enabled_group_ids = set(self._always_group_ids)
+        for char in self.trigger_chars.intersection(text_chars):
+            enabled_group_ids |= self._char2group_ids[char]
+        return enabled_group_ids
+
+    def iter_pattern_spans(
+        self, text: str, text_chars: Optional[Set[str]] = None
+    ) -> List[Tuple[int, Iterator[Tuple[int, int]]]]:
+        """Patternごとに、文字列中のマッチの開始位置と終了位置を出現順に返すイテレータを作成する
+
+        走査で求めたマッチの範囲のみを返し、re.Matchは生成しない
+
+        Args:
+            text (str): 入力文字列
+            text_chars (Optional[Set[str]], optional): 入力文字列に含まれる文字の集合. Defaults to None.
+
+        Returns:
+            List[Tuple[int, Iterator[Tuple[int, int]]]]: Patternのインデックスとマッチの範囲のイテレータ。Patternの順に並ぶ
+        """
+        pattern_spans: List[Tuple[int, Iterator[Tuple[int, int]]]] = []
+        for pattern_i, starts, ends in self._scan(text, text_chars):
+            if starts is None or ends is None:
+                re_matches = self.compiled_patterns[pattern_i].finditer(text)
+                pattern_spans.append((pattern_i, (re_match.span() for re_match in re_matches)))
+            else:
+                pattern_spans.append((pattern_i, zip(starts, ends)))
+        return pattern_spans
+
+    def _scan(
+        self, text: str, text_chars: Optional[Set[str]]
+    ) -> List[Tuple[int, Optional[List[int]], Optional[List[int]]]]:
+        """適用が必要なPatternについて、マッチの開始位置と終了位置を求める
+
+        Args:
+            text (str): 入力文字列
+            text_chars (Optional[Set[str]]): 入力文字列に含まれる文字の集合
+
+        Returns:
+            List[Tuple[int, Optional[List[int]], Optional[List[int]]]]:
+                Patternのインデックスと、マッチの開始位置と終了位置のリスト。
+                個別にre.finditer()を適用するPatternの場合、開始位置と終了位置はNoneとする
+        """
+        if text_chars is None:
+            text_chars = set(text)
+        enabled_group_ids = self.get_enabled_group_ids(text_chars)
+        if not enabled_group_ids:
+            return []
+
+        pattern_id2starts: List[List[int]] = [[] for _ in self.patterns]
+        pattern_id2ends: List[List[int]] = [[] for _ in self.patterns]
+        next_start_i = [0] * len(self.patterns)
+        if len(enabled_group_ids) == len(self._group_scanners):
+            self._full_scanner.scan(text, pattern_id2starts, pattern_id2ends, next_start_i)
+        else:
+            for group_i in enabled_group_ids:
+                self._group_scanners[group_i].scan(text, pattern_id2starts, pattern_id2ends, next_start_i)
+
+        scanned: List[Tuple[int, Optional[List[int]], Optional[List[int]]]] = []
+        for pattern_i in range(len(self.patterns)):
+            if self._pattern_id2group_i[pattern_i] not in enabled_group_ids:
+                continue
+
+            if pattern_i in self._fallback_pattern_ids:
+                scanned.append((pattern_i, None, None))
+            elif pattern_id2starts[pattern_i]:
+                scanned.append((pattern_i, pattern_id2starts[pattern_i], pattern_id2ends[pattern_i]))
+        return scanned
@@ -0,0 +1,143 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from ja_timex.pattern.place import Pattern
+from ja_timex.tag import Extract
+
+
+@dataclass
+class PatternProfile:
+    """1つのPatternについての計測結果
+
+    type_name: パターンを持つtaggerの種類
+    pattern: 対象のPattern
+    num_calls: finditerを呼び出した回数
+    scan_time: finditerによる走査の累積時間(秒)
+    num_matches: マッチした数
+    num_filtered_survivors: pattern_filtersによって除外されなかった数
+    num_survivors: 重複除去の後まで残った数
+    """
+
+    type_name: str
+    pattern: Pattern
+    num_calls: int = 0
+    scan_time: float = 0.0
+    num_matches: int = 0
+    num_filtered_survivors: int = 0
+    num_survivors: int = 0
+
+    @property
+    def cost_per_survivor(self) -> float:
+        """残ったマッチ1件あたりの走査時間。1件も残らなかった場合は無限大とする"""
+        if self.num_survivors == 0:
+            return float("inf") if self.scan_time > 0 else 0.0
+        return self.scan_time / self.num_survivors
+
+
+class PatternProfiler:
+    """TimexParserのパターンごとの走査時間とマッチ数を記録する
+
+    TimexParserのpattern_profilerに指定すると、すべてのパターンをまとめて検出する代わりに
+    パターンごとにfinditerを呼び出し、その時間を計測する。抽出される結果は変わらない
+    """
+
+    def __init__(self) -> None:
+        self.profiles: Dict[int, PatternProfile] = {}
+        self._lock = threading.Lock()
+
+    def _get_profile(self, type_name: str, pattern: Pattern) -> PatternProfile:
+        profile = self.profiles.get(id(pattern))
+        if profile is None:
+            profile = self.profiles[id(pattern)] = PatternProfile(type_name=type_name, pattern=pattern)
+        return profile
+
+    def record_scan(self, type_name: str, pattern: Pattern, scan_time: float, num_matches: int) -> None:
+        """1回のfinditerによる走査を記録する
+
+        Args:
+            type_name (str): パターンを持つtaggerの種類
+            pattern (Pattern): 走査したPattern
+            scan_time (float): 走査にかかった時間(秒)
+            num_matches (int): マッチした数
+        """
+        with self._lock:
+            profile = self._get_profile(type_name, pattern)
+            profile.num_calls += 1
+            profile.scan_time += scan_time
+            profile.num_matches += num_matches
+
+    def record_filtered_survivors(self, extracts: Iterable[Extract]) -> None:
+        """pattern_filtersによって除外されなかったExtractを記録する
+
+        Args:
+            extracts (Iterable[Extract]): フィルタ後のExtract
+        """
+        with self._lock:
+            for extract in extracts:
+                self._get_profile(extract.type_name, extract.pattern).num_filtered_survivors += 1
+
+    def record_survivors(self, extracts: Iterable[Extract]) -> None:
+        """重複除去の後まで残ったExtractを記録する
+
+        Args:
+            extracts (Iterable[Extract]): 重複除去後のExtract
+        """
+        with self._lock:
+            for extract in extracts:
+                self._get_profile(extract.type_name, extract.pattern).num_survivors += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.profiles = {}
+
+    def ranking(self, key: str = "scan_time") -> List[PatternProfile]:
+        """計測結果をコストの大きい順に並べる
+
+        Args:
+            key (str, optional): 並べ替えに用いる値。"scan_time"または"cost_per_survivor". Defaults to "scan_time".
+
+        Raises:
+            ValueError: keyが不正な場合
+
+        Returns:
+            List[PatternProfile]: 並べ替えた計測結果
+        """
+        if key not in ("scan_time", "cost_per_survivor"):
+            raise ValueError(f"Unknown ranking key: {key}")
+        with self._lock:
+            profiles = list(self.profiles.values())
+        return sorted(profiles, key=lambda profile: (getattr(profile, key), profile.scan_time), reverse=True)
+
+    def report(self, key: str = "scan_time", top_n: Optional[int] = None) -> str:
+        """計測結果をコストの大きい順に表形式の文字列にする
+
+        Args:
+            key (str, optional): 並べ替えに用いる値。"scan_time"または"cost_per_survivor". Defaults to "scan_time".
+            top_n (Optional[int], optional): 出力するパターンの数。Noneの場合はすべて出力する. Defaults to None.
+
+        Returns:
+            str: 計測結果の表
+        """
+        profiles = self.ranking(key)
+        if top_n is not None:
+            profiles = profiles[:top_n]
+
+        lines = ["rank\ttype\tcalls\tscan_ms\tmatches\tfiltered\tsurvivors\tms_per_survivor\tpattern"]
+        for rank, profile in enumerate(profiles, start=1):
+            lines.append(
+                "\t".join(
+                    [
+                        str(rank),
+                        profile.type_name,
+                        str(profile.num_calls),
+                        f"{profile.scan_time * 1000:.3f}",
+                        str(profile.num_matches),
+                        str(profile.num_filtered_survivors),
+                        str(profile.num_survivors),
+                        f"{profile.cost_per_survivor * 1000:.3f}",
+                        profile.pattern.re_pattern,
+                    ]
+                )
+            )
+        return "\n".join(lines)
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import pendulum
+
+from ja_timex.batch import TimexPayload
+
+# キャッシュに保持する、抽出されたTIMEXの値
+CachedResult = List[TimexPayload]
+
+# LRUResultCacheのエントリごとに見積もる、キーと管理用の構造の大きさ(バイト)
+ENTRY_OVERHEAD_SIZE = 200
+
+
+@lru_cache(maxsize=None)
+def get_package_fingerprint() -> str:
+    """ja_timexのソースコードと辞書ファイルの内容から、パッケージの版を区別するハッシュ値を求める
+
+    pattern/*.pyやdictionary/*.jsonなどが変更された場合に、永続化したキャッシュを無効にするために用いる
+
+    Returns:
+        str: ソースコードと辞書ファイルの内容のハッシュ値
+    """
+    package_dir = Path(__file__).parent
+    h = hashlib.sha256()
+    for path in sorted(list(package_dir.glob("**/*.py")) + list(package_dir.glob("dictionary/*"))):
+        h.update(path.relative_to(package_dir).as_posix().encode("utf8"))
+        h.update(b"\0")
+        h.update(path.read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def make_result_cache_key(raw_text: str, reference: Optional[pendulum.DateTime], config_fingerprint: str) -> bytes:
+    """入力文字列と基準日時、TimexParserの設定から、結果のキャッシュのキーを作成する
+
+    Args:
+        raw_text (str): 入力文字列
+        reference (Optional[pendulum.DateTime]): 基準日時
+        config_fingerprint (str): TimexParserの設定を表す文字列
+
+    Returns:
+        bytes: キャッシュのキー
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in (config_fingerprint, repr(reference), raw_text):
+        h.update(part.encode("utf8"))
+        h.update(b"\0")
+    return h.digest()
+
+
+class BaseResultCache(metaclass=ABCMeta):
+    """TimexParser.parse()の結果を、入力文字列と基準日時、設定ごとに保持するキャッシュ
+
+    結果はTIMEXではなくTimexPayloadのリストとして保持し、取得のたびに新しいTIMEXを組み立てる。
+    そのため、返されたTIMEXを変更してもキャッシュの内容は変わらない。
+    正規化後の文字列は保持せず、必要な場合はTimexParserが入力文字列から求め直す
+
+    hits: キャッシュから結果を返した回数
+    misses: キャッシュに結果がなかった回数
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: bytes) -> Optional[CachedResult]:
+        """キーに対応する結果を取得する
+
+        Args:
+            key (bytes): make_result_cache_key()で作成したキー
+
+        Returns:
+            Optional[CachedResult]: 保持している結果。ない場合はNone
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def put(self, key: bytes, result: CachedResult) -> None:
+        """キーに対応する結果を保持する
+
+        Args:
+            key (bytes): make_result_cache_key()で作成したキー
+            result (CachedResult): 保持する結果
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError()
+
+    @property
+    def hit_rate(self) -> float:
+        num_lookups = self.hits + self.misses
+        return self.hits / num_lookups if num_lookups else 0.0
+
+
+class LRUResultCache(BaseResultCache):
+    """エントリ数と見積もりのサイズに上限を持ち、最も長く参照されていない結果から削除するキャッシュ
+
+    e.g.
+        parser = TimexParser(result_cache=LRUResultCache(max_entries=100000, max_size=256 * 1024 * 1024))
+    """
+
+    def __init__(self, max_entries: int = 10000, max_size: Optional[int] = None) -> None:
+        """
+        Args:
+            max_entries (int, optional): 保持するエントリ数の上限. Defaults to 10000.
+            max_size (Optional[int], optional): 保持する結果の大きさの見積もり(バイト)の上限。
+                Noneの場合は上限を設けない. Defaults to None.
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self._entries: "OrderedDict[bytes, Tuple[CachedResult, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def estimate_size(result: CachedResult) -> int:
+        """結果の大きさをおおまかに見積もる
+
+        Args:
+            result (CachedResult): 対象の結果
+
+        Returns:
+            int: 見積もりの大きさ(バイト)
+        """
+        size = ENTRY_OVERHEAD_SIZE + sys.getsizeof(result)
+        for payload in result:
+            size += sys.getsizeof(payload) + sum(sys.getsizeof(value) for value in payload)
+        return size
+
+    def get(self, key: bytes) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, result: CachedResult) -> None:
+        size = self.estimate_size(result)
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self.size += size
+
+            while len(self._entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+class SQLiteResultCache(BaseResultCache):
+    """結果をSQLiteのファイルに保持し、プロセスをまたいで再利用するキャッシュ
+
+    同じコーパスを繰り返し解析する場合に、変更のない入力文字列はキーのハッシュ値の計算と読み出しのみで結果を得られる。
+    結果はTimexPayloadのリストのみをJSONとして保存し、入力文字列や正規化後の文字列は保存しない。
+    開いたときにget_package_fingerprint()の値が保存時と異なる場合は、保存されている結果をすべて削除する
+
+    NOTE: custom_taggerのparse_funcなど、ja_timexの外にあるコードの変更は検知しないため、その場合はclear()する
+
+    e.g.
+        with SQLiteResultCache("timex_cache.sqlite3") as cache:
+            parser = TimexParser(result_cache=cache)
+            for text in texts:
+                parser.parse(text)
+    """
+
+    def __init__(self, path: Union[str, Path], commit_interval: int = 1000) -> None:
+        """
+        Args:
+            path (Union[str, Path]): SQLiteのファイルのパス
+            commit_interval (int, optional): 書き込みをまとめてコミットする件数. Defaults to 1000.
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.commit_interval = commit_interval
+        self._num_uncommitted = 0
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID"
+        )
+
+        package_fingerprint = get_package_fingerprint()
+        row = self._connection.execute("SELECT value FROM meta WHERE name = 'package_fingerprint'").fetchone()
+        if row is None or row[0] != package_fingerprint:
+            self._connection.execute("DELETE FROM results")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('package_fingerprint', ?)", (package_fingerprint,)
+            )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __enter__(self) -> "SQLiteResultCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def _dumps(result: CachedResult) -> str:
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def _loads(value: str) -> CachedResult:
+        # JSONではtupleがlistになるため、spanとraw_spanをtupleに戻す
+        restored_payloads = []
+        for payload in json.loads(value):
+            payload[3] = tuple(payload[3])
+            if payload[5] is not None:
+                payload[5] = tuple(payload[5])
+            restored_payloads.append(tuple(payload))
+        return restored_payloads
+
+    def get(self, key: bytes) -> Optional[CachedResult]:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._loads(row[0])
+
+    def put(self, key: bytes, result: CachedResult) -> None:
+        value = self._dumps(result)
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)", (key, value))
+            self._num_uncommitted += 1
+            if self._num_uncommitted >= self.commit_interval:
+                self._connection.commit()
+                self._num_uncommitted = 0
+
+    def commit(self) -> None:
+        """まとめている書き込みをコミットする"""
+        with self._lock:
+            self._connection.commit()
+            self._num_uncommitted = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+            self._connection.commit()
+            self._num_uncommitted = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        """書き込みをコミットしてファイルを閉じる"""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
@@ -10,28 +10,22 @@ from ja_timex.pattern.place import Pattern
 from ja_timex.util import set_timezone
 
 
-@dataclass
-class TIMEX:
+class BaseTIMEX:
+    """TIMEXとCompactTIMEXに共通する、時間情報表現を扱うメソッド"""
+
+    __slots__ = ()
+
     type: str
     value: str
     text: str
-    span: Tuple[int, int]
-
-    # 正規化前の抽出テキストと開始終了位置
-    raw_text: Optional[str] = None
-    raw_span: Optional[Tuple[int, int]] = None
-
-    parsed: Dict[str, str] = field(default_factory=dict)
-
-    tid: Optional[str] = None
-    freq: Optional[str] = None
-    quant: Optional[str] = None
-    mod: Optional[str] = None
-    range_start: Optional[bool] = None
-    range_end: Optional[bool] = None
-
-    pattern: Optional[Pattern] = None
-    reference: Optional[pendulum.DateTime] = None
+    parsed: Dict[str, str]
+    tid: Optional[str]
+    freq: Optional[str]
+    quant: Optional[str]
+    mod: Optional[str]
+    range_start: Optional[bool]
+    range_end: Optional[bool]
+    reference: Optional[pendulum.DateTime]
 
     def to_tag(self) -> str:
         """TIMEX3のタグ文字列を生成する
@@ -86,6 +80,25 @@ class TIMEX:
             return None
 
         default_timezone = set_timezone(tz)
+        return self.resolve_datetime(default_timezone, pendulum.now().year, self.reference)
+
+    def resolve_datetime(
+        self, default_timezone: Timezone, default_year: int, reference: Optional[pendulum.DateTime]
+    ) -> Optional[datetime]:
+        """設定済みのタイムゾーンと基準日時を用いて、datetimeに変換する
+
+        to_datetime()と、複数のTIMEXをまとめて変換するresolve_datetimes()で共通の処理
+
+        Args:
+            default_timezone (Timezone): DATEに用いるタイムゾーン
+            default_year (int): 年が特定できない場合に用いる年
+            reference (Optional[pendulum.DateTime]): 基準日時
+
+        Returns:
+            Optional[datetime]: 変換したdatetime。変換できない場合はNone
+        """
+        if not self.is_valid_datetime:
+            return None
 
         if self.type == "DATE":
             # 世紀や曜日はdatetimeでの表現が不可能なため変換しない
@@ -93,19 +106,19 @@ class TIMEX:
                 if exclude_pattern in self.parsed:
                     return None
 
-            year = self.fill_target_value(target="calendar_year", fill_str="XXXX", default_value=pendulum.now().year)
+            year = self.fill_target_value(target="calendar_year", fill_str="XXXX", default_value=default_year)
             month = self.fill_target_value(target="calendar_month", fill_str="XX", default_value=1)
             day = self.fill_target_value(target="calendar_day", fill_str="XX", default_value=1)
 
-            if self.reference:
+            if reference:
                 # 詳細な挙動は test_reference_datetime_default_year を参照
                 if self.parsed.get("calendar_year") == "XXXX":
-                    year = self.reference.year
+                    year = reference.year
                     if self.parsed.get("calendar_month") == "XX":
-                        month = self.reference.month
+                        month = reference.month
 
             return pendulum.datetime(year=year, month=month, day=day, tz=default_timezone)
-        elif self.type == "TIME" and self.reference:
+        elif self.type == "TIME" and reference:
             hour = self.fill_target_value(target="clock_hour", fill_str="XX", default_value=0)
             minute = self.fill_target_value(target="clock_minute", fill_str="XX", default_value=0)
             second = self.fill_target_value(target="clock_second", fill_str="XX", default_value=0)
@@ -122,21 +135,21 @@ class TIMEX:
                 minute = 30
 
             return pendulum.datetime(
-                year=self.reference.year,
-                month=self.reference.month,
-                day=self.reference.day + day_add,
+                year=reference.year,
+                month=reference.month,
+                day=reference.day + day_add,
                 hour=hour,
                 minute=minute,
                 second=second,
-                tz=self.reference.tz,
+                tz=reference.tz,
             )
-        elif self.type == "DURATION" and self.reference:
+        elif self.type == "DURATION" and reference:
             sign = 1
             if self.mod == "BEFORE":
                 sign = -1
 
             duration = self.to_duration()
-            return self.reference + sign * duration
+            return reference + sign * duration
 
         else:
             return None
@@ -150,7 +163,6 @@ class TIMEX:
             return False
 
     def to_duration(self) -> timedelta:
-
         unit_args = {
             "years": float(self.parsed.get("year", 0)),
             "months": float(self.parsed.get("month", 0)),
@@ -213,6 +225,162 @@ class TIMEX:
         return f"<TIMEX3 {attributes_text}>"
 
 
+@dataclass(repr=False)
+class TIMEX(BaseTIMEX):
+    type: str
+    value: str
+    text: str
+    span: Tuple[int, int]
+
+    # 正規化前の抽出テキストと開始終了位置
+    raw_text: Optional[str] = None
+    raw_span: Optional[Tuple[int, int]] = None
+
+    parsed: Dict[str, str] = field(default_factory=dict)
+
+    tid: Optional[str] = None
+    freq: Optional[str] = None
+    quant: Optional[str] = None
+    mod: Optional[str] = None
+    range_start: Optional[bool] = None
+    range_end: Optional[bool] = None
+
+    pattern: Optional[Pattern] = None
+    reference: Optional[pendulum.DateTime] = None
+
+    def to_compact(self) -> "CompactTIMEX":
+        """メモリ使用量の少ないCompactTIMEXに変換する
+
+        Returns:
+            CompactTIMEX: 変換したCompactTIMEX
+        """
+        return CompactTIMEX.from_timex(self)
+
+
+class CompactTIMEX(BaseTIMEX):
+    """大量のTIMEXを保持する際に用いる、メモリ使用量の少ないTIMEX
+
+    __slots__によりインスタンスごとの__dict__を持たず、Patternは登録簿の整数のidで保持する。
+    parsedには値が空でない要素のみを保持する。
+    TIMEXと同じ属性とto_tag(), to_datetime(), to_duration()を利用できる
+
+    NOTE: pattern_idは生成したプロセス内でのみ有効
+    """
+
+    __slots__ = (
+        "type",
+        "value",
+        "text",
+        "span",
+        "raw_text",
+        "raw_span",
+        "parsed",
+        "tid",
+        "freq",
+        "quant",
+        "mod",
+        "range_start",
+        "range_end",
+        "pattern_id",
+        "reference",
+    )
+
+    def __init__(
+        self,
+        type: str,
+        value: str,
+        text: str,
+        span: Tuple[int, int],
+        raw_text: Optional[str] = None,
+        raw_span: Optional[Tuple[int, int]] = None,
+        parsed: Optional[Dict[str, str]] = None,
+        tid: Optional[str] = None,
+        freq: Optional[str] = None,
+        quant: Optional[str] = None,
+        mod: Optional[str] = None,
+        range_start: Optional[bool] = None,
+        range_end: Optional[bool] = None,
+        pattern_id: Optional[int] = None,
+        reference: Optional[pendulum.DateTime] = None,
+    ) -> None:
+        self.type = type
+        self.value = value
+        self.text = text
+        self.span = span
+        self.raw_text = raw_text
+        self.raw_span = raw_span
+        # 値が空の要素は保持しない
+        self.parsed = {key: value for key, value in (parsed or {}).items() if value is not None and value != ""}
+        self.tid = tid
+        self.freq = freq
+        self.quant = quant
+        self.mod = mod
+        self.range_start = range_start
+        self.range_end = range_end
+        self.pattern_id = pattern_id
+        self.reference = reference
+
+    @classmethod
+    def from_timex(cls, timex: TIMEX) -> "CompactTIMEX":
+        return cls(
+            type=timex.type,
+            value=timex.value,
+            text=timex.text,
+            span=timex.span,
+            raw_text=timex.raw_text,
+            raw_span=timex.raw_span,
+            parsed=timex.parsed,
+            tid=timex.tid,
+            freq=timex.freq,
+            quant=timex.quant,
+            mod=timex.mod,
+            range_start=timex.range_start,
+            range_end=timex.range_end,
+            pattern_id=timex.pattern.register() if timex.pattern is not None else None,
+            reference=timex.reference,
+        )
+
+    @property
+    def pattern(self) -> Optional[Pattern]:
+        return Pattern.from_registered_id(self.pattern_id) if self.pattern_id is not None else None
+
+    def to_timex(self) -> TIMEX:
+        """TIMEXに変換する
+
+        Returns:
+            TIMEX: 変換したTIMEX
+        """
+        return TIMEX(
+            type=self.type,
+            value=self.value,
+            text=self.text,
+            span=self.span,
+            raw_text=self.raw_text,
+            raw_span=self.raw_span,
+            parsed=dict(self.parsed),
+            tid=self.tid,
+            freq=self.freq,
+            quant=self.quant,
+            mod=self.mod,
+            range_start=self.range_start,
+            range_end=self.range_end,
+            pattern=self.pattern,
+            reference=self.reference,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __getstate__(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
 @dataclass
 class AnnotatedTIMEX(TIMEX):
     """アノテーションされたTIMEXタグの情報を表現する際に用いるTIMEX拡張"""
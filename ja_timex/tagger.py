@@ -1,4 +1,3 @@
-import re
 from typing import List, Optional
 
 from ja_timex.pattern.abstime import patterns as abstime_patterns
@@ -31,7 +30,7 @@ class BaseTagger:
         text = text.strip()
 
         for pattern in self.patterns:
-            re_match = re.fullmatch(pattern.re_pattern, text)
+            re_match = pattern.re_compiled.fullmatch(text)
             if re_match:
                 results.append(pattern.parse_func(re_match, pattern))
 
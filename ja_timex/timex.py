@@ -1,42 +1,121 @@
+import bisect
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
 import re
+import time
 from collections import defaultdict
-from typing import DefaultDict, List, Optional
+from dataclasses import dataclass, field
+from typing import Any, DefaultDict, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 import pendulum
 
-from ja_timex.extract_filter import BaseFilter, DecimalFilter, NumexpFilter, PartialNumFilter, PartialPhraseFilter
-from ja_timex.number_normalizer import DiffIndex, NumberNormalizer
+from ja_timex.batch import (
+    TimexColumns,
+    TimexPayload,
+    init_batch_worker,
+    parse_in_batch_worker,
+    payload_to_timex,
+    timex_to_payload,
+)
+from ja_timex.extract_filter import (
+    BaseFilter,
+    DecimalFilter,
+    FilterPipeline,
+    NumexpFilter,
+    PartialNumFilter,
+    PartialPhraseFilter,
+)
+from ja_timex.number_normalizer import NumberNormalizer, OffsetMap
+from ja_timex.parse_hook import BaseParseHook, ParseStats
+from ja_timex.pattern.place import compile_pattern
+from ja_timex.pattern_matcher import MultiPatternMatcher
+from ja_timex.pattern_profiler import PatternProfiler
+from ja_timex.result_cache import BaseResultCache, make_result_cache_key
 from ja_timex.tag import TIMEX, Extract
 from ja_timex.tagger import AbstimeTagger, DurationTagger, ReltimeTagger, SetTagger
-from ja_timex.util import detect_range_expression_before_timex
+from ja_timex.util import (
+    ABBREV_RANGE_EXPRESSIONS,
+    RANGE_EXPRESSIONS,
+    find_abbrev_number_start,
+    get_abbrev_suffix,
+    get_range_expression_matcher,
+)
+
+# parse_stream()で一度に確定させる文字数と、その前後に含める文脈の文字数
+STREAM_WINDOW_SIZE = 4096
+STREAM_OVERLAP = 256
+
+# 候補となるマッチの簡易な表現。(開始位置, 開始位置 - 終了位置, type_id, pattern_id)
+# type_idはTimexParser.type_names、pattern_idはTimexParser.pattern_listのインデックスで、
+# タプルとしての比較順が重複除去で優先する順となる
+Candidate = Tuple[int, int, int, int]
+
+
+@dataclass
+class ParseContext:
+    """TimexParserによる1回の解析の状態
+
+    TimexParserのインスタンスではなくこのオブジェクトに解析中の状態を保持することで、
+    1つのTimexParserを複数のスレッドから同時に利用できるようにする
+
+    raw_text: 入力文字列
+    processed_text: 数の正規化後の文字列
+    offset_map: 数の正規化前後のインデックスの対応
+    timexes: 抽出されたTIMEXのリスト
+    """
+
+    raw_text: str
+    processed_text: str
+    offset_map: OffsetMap = field(default_factory=OffsetMap)
+    timexes: List[TIMEX] = field(default_factory=list)
 
 
 class TimexParser:
     def __init__(
         self,
-        number_normalizer=NumberNormalizer(),
-        abstime_tagger=AbstimeTagger(),
-        duration_tagger=DurationTagger(),
-        reltime_tagger=ReltimeTagger(),
-        set_tagger=SetTagger(),
+        number_normalizer: Optional[NumberNormalizer] = None,
+        abstime_tagger: Optional[AbstimeTagger] = None,
+        duration_tagger: Optional[DurationTagger] = None,
+        reltime_tagger: Optional[ReltimeTagger] = None,
+        set_tagger: Optional[SetTagger] = None,
         custom_tagger=None,
-        pattern_filters: List[BaseFilter] = [
-            NumexpFilter(),
-            PartialNumFilter(),
-            DecimalFilter(),
-            PartialPhraseFilter(),
-        ],
+        pattern_filters: Optional[List[BaseFilter]] = None,
         reference: Optional[pendulum.DateTime] = None,
         ignore_kansuji: bool = False,
+        parse_hook: Optional[BaseParseHook] = None,
+        pattern_profiler: Optional[PatternProfiler] = None,
+        adaptive_filter_order: bool = False,
+        result_cache: Optional[BaseResultCache] = None,
+        range_expressions: Sequence[str] = RANGE_EXPRESSIONS,
+        abbrev_range_expressions: Sequence[str] = ABBREV_RANGE_EXPRESSIONS,
     ) -> None:
-        self.number_normalizer = number_normalizer
-        self.abstime_tagger = abstime_tagger
-        self.duration_tagger = duration_tagger
-        self.reltime_tagger = reltime_tagger
-        self.set_tagger = set_tagger
+        # デフォルト引数のインスタンスを複数のTimexParserで共有しないように、ここで生成する
+        self.number_normalizer = number_normalizer if number_normalizer is not None else NumberNormalizer()
+        self.abstime_tagger = abstime_tagger if abstime_tagger is not None else AbstimeTagger()
+        self.duration_tagger = duration_tagger if duration_tagger is not None else DurationTagger()
+        self.reltime_tagger = reltime_tagger if reltime_tagger is not None else ReltimeTagger()
+        self.set_tagger = set_tagger if set_tagger is not None else SetTagger()
         self.custom_tagger = custom_tagger
         self.reference = reference
-        self.pattern_filters = pattern_filters
+        self.parse_hook = parse_hook
+        self.pattern_profiler = pattern_profiler
+        self.result_cache = result_cache
+        self._config_fingerprint: Optional[str] = None
+        self._config_fingerprint_filters: List[Tuple[BaseFilter, int]] = []
+        # 範囲表現と、単位が省略された数字を検出するための接続表現
+        self.range_expression_matcher = get_range_expression_matcher(tuple(range_expressions))
+        self.abbrev_range_expression_matcher = get_range_expression_matcher(tuple(abbrev_range_expressions))
+        if pattern_filters is None:
+            pattern_filters = [
+                NumexpFilter(),
+                PartialNumFilter(),
+                DecimalFilter(),
+                PartialPhraseFilter(),
+            ]
+        self.filter_pipeline = FilterPipeline(pattern_filters, adaptive=adaptive_filter_order)
 
         self.number_normalizer.set_ignore_kansuji(ignore_kansuji)
 
@@ -48,36 +127,440 @@ class TimexParser:
         self.all_patterns["reltime"] = self.reltime_tagger.patterns
         self.all_patterns["set"] = self.set_tagger.patterns
 
+        self._build_pattern_matchers()
+
+    @property
+    def pattern_filters(self) -> List[BaseFilter]:
+        return self.filter_pipeline.filters
+
+    @pattern_filters.setter
+    def pattern_filters(self, pattern_filters: List[BaseFilter]) -> None:
+        self.filter_pipeline = FilterPipeline(pattern_filters, adaptive=self.filter_pipeline.adaptive)
+        self._config_fingerprint = None
+
+    @property
+    def config_fingerprint(self) -> str:
+        """結果のキャッシュにおいて、パターンとフィルタの設定を区別するための文字列
+
+        pattern_filtersの置き換えや、add_units()などによるフィルタの設定の変更は、次の参照時に反映される。
+        NOTE: パターンを直接変更した場合は、reset_config_fingerprint()を呼び出す
+
+        Returns:
+            str: パターンとフィルタの設定のハッシュ値
+        """
+        config_fingerprint = self._config_fingerprint
+        if config_fingerprint is None or self._is_filter_config_changed():
+            self._config_fingerprint_filters = [(f, f.config_version) for f in self.pattern_filters]
+            h = hashlib.sha256()
+            for type_name, patterns in self.all_patterns.items():
+                for pattern in patterns:
+                    parse_func = pattern.parse_func
+                    parse_func_name = f"{parse_func.__module__}.{getattr(parse_func, '__qualname__', parse_func)}"
+                    h.update(f"{type_name}\t{pattern.re_pattern}\t{parse_func_name}\t{pattern.option!r}\n".encode())
+            for pattern_filter in self.pattern_filters:
+                h.update(pattern_filter.config_key().encode())
+                h.update(b"\0")
+            for matcher in (self.range_expression_matcher, self.abbrev_range_expression_matcher):
+                h.update("\t".join(matcher.range_expressions).encode())
+                h.update(b"\0")
+            config_fingerprint = self._config_fingerprint = h.hexdigest()
+        return config_fingerprint
+
+    def reset_config_fingerprint(self) -> None:
+        self._config_fingerprint = None
+
+    def _is_filter_config_changed(self) -> bool:
+        pattern_filters = self.pattern_filters
+        if len(pattern_filters) != len(self._config_fingerprint_filters):
+            return True
+        return any(
+            f is not pattern_filter or version != pattern_filter.config_version
+            for (f, version), pattern_filter in zip(self._config_fingerprint_filters, pattern_filters)
+        )
+
+    def _build_pattern_matchers(self) -> None:
+        """all_patternsから、パターンの検出に用いるオブジェクトを構築する"""
+        # taggerごとにすべてのパターンをまとめて検出する
+        self.pattern_matchers = {
+            type_name: MultiPatternMatcher(patterns) for type_name, patterns in self.all_patterns.items()
+        }
+        # 時間情報表現を含みえない入力文字列を、正規化の前に判定するための正規表現
+        self.re_trigger_char = self._compile_trigger_char()
+
+        # プロセス間でTIMEXを受け渡す際に、Patternをインデックスで表すための対応
+        self.pattern_list = [pattern for patterns in self.all_patterns.values() for pattern in patterns]
+        self.pattern2index = {id(pattern): i for i, pattern in enumerate(self.pattern_list)}
+        # 候補のre.Matchは、走査に用いたMultiPatternMatcherの正規表現で求め直す
+        self.compiled_pattern_list = [
+            re_compiled
+            for pattern_matcher in self.pattern_matchers.values()
+            for re_compiled in pattern_matcher.compiled_patterns
+        ]
+        self._config_fingerprint = None
+        # 候補の比較でtype_nameの順を整数で表すため、type_nameを昇順に並べておく
+        self.type_names = sorted(self.all_patterns)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # コンパイル済みの正規表現などは復元時に再構築する
+        state = self.__dict__.copy()
+        derived_keys = (
+            "pattern_matchers",
+            "re_trigger_char",
+            "pattern_list",
+            "pattern2index",
+            "compiled_pattern_list",
+            "type_names",
+        )
+        for key in derived_keys + ("raw_text", "processed_text"):
+            state.pop(key, None)
+        # 結果のキャッシュとパターンごとの計測結果はプロセス間で共有しない
+        state["result_cache"] = None
+        state["pattern_profiler"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._build_pattern_matchers()
+
     def parse(self, raw_text: str) -> List[TIMEX]:
         """入力文字列からTIMEXを抽出する
 
+        直近に解析した入力文字列と正規化後の文字列を、それぞれraw_textとprocessed_textに保持する。
+        複数のスレッドから同時に呼び出す場合にこれらの値が必要なときは、parse_with_context()を利用する
+
+        result_cacheが指定されている場合は、同じ入力文字列と基準日時、設定に対する結果をキャッシュから返す
+
         Args:
             raw_text (str): 入力文字列
 
         Returns:
             List[TIMEX]: 抽出されたTIMEXのリスト
         """
+        if self.result_cache is None:
+            context = self.parse_with_context(raw_text)
+            self.raw_text = context.raw_text
+            self.processed_text = context.processed_text
+            return context.timexes
+
+        key = make_result_cache_key(
+            raw_text, self.reference, f"{self.config_fingerprint}:{self.number_normalizer.ignore_kansuji}"
+        )
+        payloads = self.result_cache.get(key)
+        if payloads is None:
+            context = self.parse_with_context(raw_text)
+            payloads = [timex_to_payload(timex, self.pattern2index) for timex in context.timexes]
+            self.result_cache.put(key, payloads)
+            self.processed_text = context.processed_text
+        else:
+            # キャッシュには正規化後の文字列を保持しないため、入力文字列から求め直す
+            self.processed_text = self._get_processed_text(raw_text)
         self.raw_text = raw_text
+
+        # TIMEXは呼び出し側で変更されうるため、キャッシュの値から毎回新しく組み立てる
+        return [payload_to_timex(payload, self.pattern_list, self.reference) for payload in payloads]
+
+    def parse_with_context(self, raw_text: str, reference: Optional[pendulum.DateTime] = None) -> ParseContext:
+        """入力文字列からTIMEXを抽出し、解析の状態とともに返す
+
+        解析中の状態はすべて返り値のParseContextに保持され、インスタンスの状態は変更しない。
+        そのため、1つのTimexParserを複数のスレッドから同時に利用できる
+
+        Args:
+            raw_text (str): 入力文字列
+            reference (Optional[pendulum.DateTime], optional): この入力文字列に対する基準日時。
+                指定しない場合はTimexParser.referenceを用いる. Defaults to None.
+
+        Returns:
+            ParseContext: 抽出されたTIMEXのリストを含む解析の状態
+        """
+        if reference is None:
+            reference = self.reference
+
+        # parse_hookが計測を求めた場合のみ、各段階の処理時間と件数を記録する
+        parse_hook = self.parse_hook
+        stats = None
+        if parse_hook is not None and parse_hook.should_record(raw_text):
+            stats = ParseStats(text_length=len(raw_text))
+            stage_start = time.perf_counter()
+
+        # どのパターンにも必要な文字を含まない場合は、以降の処理をせずに終了する
+        # 正規化を行わないため、processed_textは入力文字列のままとする
+        if self.re_trigger_char and not self.re_trigger_char.search(raw_text):
+            if parse_hook and stats:
+                parse_hook.on_parse(stats)
+            return ParseContext(raw_text=raw_text, processed_text=raw_text)
+
         # 数の認識/規格化
-        self.processed_text = self._normalize_number(raw_text)
+        processed_text, offset_map = self._normalize_number(raw_text)
+        context = ParseContext(raw_text=raw_text, processed_text=processed_text, offset_map=offset_map)
+        if stats:
+            stage_start = stats.record_stage("normalize", stage_start)
 
         # 時間表現の抽出
-        all_extracts = self._extract(self.processed_text)
-        filtered_extracts = self._extract_filter(all_extracts, self.processed_text)
-        type2extracts = self._drop_duplicates(filtered_extracts, self.processed_text)
+        ordered_candidates = self._iter_ordered_candidates(processed_text)
+        if stats:
+            stage_start = stats.record_stage("extract", stage_start)
+            stats.stage_times["extract_filter"] = 0.0
+
+        # フィルタと重複除去。フィルタの判定時間は_select_extracts()の中で累積する
+        type2extracts = self._select_extracts(ordered_candidates, processed_text, stats)
+        if stats:
+            stage_start = stats.record_stage("drop_duplicates", stage_start)
+            stats.stage_times["drop_duplicates"] = max(
+                stats.stage_times["drop_duplicates"] - stats.stage_times["extract_filter"], 0.0
+            )
 
         # ExtractからTimexへの規格化
         timex_tags = self._parse(type2extracts)
+        if stats:
+            stage_start = stats.record_stage("parse", stage_start)
 
         # 規格化後のタグの情報付与
-        timex_tags = self._modify_renge_start_and_end(timex_tags, self.processed_text)
-        timex_tags = self._extract_abbrev_patten(timex_tags, self.processed_text)
-        timex_tags = self._modify_additional_information(timex_tags)
-        timex_tags = self._adjust_normalize_index_diff(timex_tags, self.number_normalizer.diff_index_list)
+        timex_tags = self._modify_renge_start_and_end(timex_tags, processed_text)
+        timex_tags = self._extract_abbrev_patten(timex_tags, processed_text)
+        timex_tags = self._modify_additional_information(timex_tags, reference)
+        if stats:
+            stage_start = stats.record_stage("post_process", stage_start)
+        timex_tags = self._adjust_normalize_index_diff(timex_tags, context.offset_map, raw_text)
+
+        context.timexes = timex_tags
+        if parse_hook and stats:
+            stats.record_stage("adjust_index", stage_start)
+            stats.num_dropped = (
+                stats.num_extracts
+                - sum(stats.num_filtered.values())
+                - sum(len(extracts) for extracts in type2extracts.values())
+            )
+            stats.num_timexes = len(timex_tags)
+            parse_hook.on_parse(stats)
+        return context
 
-        return timex_tags
+    def parse_batch(
+        self,
+        texts: Iterable[str],
+        workers: Optional[int] = None,
+        chunksize: int = 64,
+        references: Optional[Iterable[Optional[pendulum.DateTime]]] = None,
+    ) -> List[List[TIMEX]]:
+        """複数の入力文字列からTIMEXを抽出する
+
+        workersが2以上の場合はプロセスプールで並列に処理する。各ワーカープロセスでは、初期化時に一度だけ
+        TimexParserを復元して使い回す。ワーカーからはTIMEXの値のみを返し、TIMEXは呼び出し元のプロセスで組み立てる。
+        なお、並列で処理する場合はcustom_taggerやpattern_filtersがpickle可能である必要がある。
+        また、ワーカープロセスではpattern_profilerによる計測を行わない
+
+        Args:
+            texts (Iterable[str]): 入力文字列
+            workers (Optional[int], optional): ワーカープロセス数。Noneの場合はCPU数とする. Defaults to None.
+            chunksize (int, optional): 一度にワーカーに渡す入力文字列の数. Defaults to 64.
+            references (Optional[Iterable[Optional[pendulum.DateTime]]], optional): 入力文字列ごとの基準日時。
+                指定しない場合はTimexParser.referenceを用いる. Defaults to None.
+
+        Raises:
+            ValueError: textsとreferencesの長さが異なる場合
+
+        Returns:
+            List[List[TIMEX]]: 入力文字列ごとに抽出されたTIMEXのリスト。入力と同じ順序で返す
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1:
+            documents = self._iter_batch_documents(texts, references)
+            return [self.parse_with_context(text, reference).timexes for text, reference in documents]
+
+        results = []
+        for payloads, reference in self._iter_batch_payloads(texts, workers, chunksize, references):
+            if reference is None:
+                reference = self.reference
+            results.append([payload_to_timex(payload, self.pattern_list, reference) for payload in payloads])
+        return results
+
+    def parse_batch_columnar(
+        self,
+        texts: Iterable[str],
+        workers: Optional[int] = None,
+        chunksize: int = 64,
+        references: Optional[Iterable[Optional[pendulum.DateTime]]] = None,
+    ) -> TimexColumns:
+        """複数の入力文字列からTIMEXを抽出し、列ごとの配列で返す
+
+        parse_batch()と同様に処理するが、呼び出し元のプロセスではTIMEXを生成せず、その値を直接列に追加する
+
+        Args:
+            texts (Iterable[str]): 入力文字列
+            workers (Optional[int], optional): ワーカープロセス数。Noneの場合はCPU数とする. Defaults to None.
+            chunksize (int, optional): 一度にワーカーに渡す入力文字列の数. Defaults to 64.
+            references (Optional[Iterable[Optional[pendulum.DateTime]]], optional): 入力文字列ごとの基準日時。
+                指定しない場合はTimexParser.referenceを用いる. Defaults to None.
+
+        Raises:
+            ValueError: textsとreferencesの長さが異なる場合
+
+        Returns:
+            TimexColumns: 抽出されたTIMEXの値。各行は入力文字列のインデックスを持つ
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        columns = TimexColumns()
+        for doc_index, (payloads, _) in enumerate(self._iter_batch_payloads(texts, workers, chunksize, references)):
+            columns.append_payloads(doc_index, payloads)
+        return columns
+
+    @staticmethod
+    def _iter_batch_documents(
+        texts: Iterable[str], references: Optional[Iterable[Optional[pendulum.DateTime]]]
+    ) -> Iterable[Tuple[str, Optional[pendulum.DateTime]]]:
+        if references is None:
+            return ((text, None) for text in texts)
+        return TimexParser._zip_references(texts, references)
+
+    @staticmethod
+    def _zip_references(
+        texts: Iterable[str], references: Iterable[Optional[pendulum.DateTime]]
+    ) -> Iterator[Tuple[str, Optional[pendulum.DateTime]]]:
+        missing: Any = object()
+        for text, reference in itertools.zip_longest(texts, references, fillvalue=missing):
+            if text is missing or reference is missing:
+                raise ValueError("texts and references must have the same length")
+            yield text, reference
+
+    def _iter_batch_payloads(
+        self,
+        texts: Iterable[str],
+        workers: int,
+        chunksize: int,
+        references: Optional[Iterable[Optional[pendulum.DateTime]]],
+    ) -> Iterator[Tuple[List[TimexPayload], Optional[pendulum.DateTime]]]:
+        """入力文字列ごとに、抽出したTIMEXの値と基準日時を入力と同じ順序で返す
+
+        workersが2以上の場合はプロセスプールで並列に処理する
+        """
+        documents = self._iter_batch_documents(texts, references)
+        if workers <= 1:
+            for text, reference in documents:
+                timexes = self.parse_with_context(text, reference).timexes
+                yield [timex_to_payload(timex, self.pattern2index) for timex in timexes], reference
+            return
+
+        with multiprocessing.Pool(processes=workers, initializer=init_batch_worker, initargs=(self,)) as pool:
+            yield from pool.imap(parse_in_batch_worker, documents, chunksize=chunksize)
+
+    def parse_stream(
+        self,
+        chunks: Iterable[str],
+        window_size: int = STREAM_WINDOW_SIZE,
+        overlap: int = STREAM_OVERLAP,
+        reference: Optional[pendulum.DateTime] = None,
+    ) -> Iterator[TIMEX]:
+        """分割して与えられる入力文字列から、TIMEXを逐次的に抽出する
+
+        入力文字列全体を保持せず、window_sizeずつ確定させながら処理する。
+        各ウィンドウは前後にoverlap文字ずつの文脈を含めて解析し、開始位置がウィンドウ内にあるTIMEXのみを返す。
+        返されるTIMEXのspan, raw_span, tidは、入力文字列全体を通したものとなる。
+        なお、overlapよりも長い時間表現は正しく抽出できない場合がある
+
+        Args:
+            chunks (Iterable[str]): 分割された入力文字列
+            window_size (int, optional): 一度に確定させる文字数. Defaults to STREAM_WINDOW_SIZE.
+            overlap (int, optional): ウィンドウの前後に含める文字数. Defaults to STREAM_OVERLAP.
+            reference (Optional[pendulum.DateTime], optional): 基準日時。
+                指定しない場合はTimexParser.referenceを用いる. Defaults to None.
+
+        Yields:
+            Iterator[TIMEX]: 抽出されたTIMEX。開始位置の順に返す
+        """
+        buffer = ""
+        # bufferの先頭の、入力文字列全体におけるインデックス
+        buffer_offset = 0
+        # bufferにおいて、これより前の位置から始まるTIMEXは確定済み
+        committed_i = 0
+        # 確定位置に対応する、正規化後の文字列全体におけるインデックス
+        processed_committed_i = 0
+        tid_i = 0
+
+        def parse_window(commit_end_i: int) -> Iterator[TIMEX]:
+            nonlocal processed_committed_i, tid_i
+
+            window_start_i = max(0, committed_i - overlap)
+            window_text = buffer[window_start_i : commit_end_i + overlap]
+            context = self.parse_with_context(window_text, reference)
+
+            local_committed_i = committed_i - window_start_i
+            local_commit_end_i = commit_end_i - window_start_i
+            processed_start_i = context.offset_map.to_processed(local_committed_i)
+            processed_end_i = context.offset_map.to_processed(local_commit_end_i)
+            global_offset = buffer_offset + window_start_i
+
+            for timex in context.timexes:
+                if timex.raw_span is None or timex.span is None:
+                    continue
+                raw_start_i, raw_end_i = timex.raw_span
+                # 開始位置によって各TIMEXを返すウィンドウを一つに定める
+                # parse()と同様に、他のTIMEXの範囲内から始まるTIMEX(省略された範囲表現など)も返す
+                if not local_committed_i <= raw_start_i < local_commit_end_i:
+                    continue
+
+                timex.raw_span = (raw_start_i + global_offset, raw_end_i + global_offset)
+                processed_diff = processed_committed_i - processed_start_i
+                timex.span = (timex.span[0] + processed_diff, timex.span[1] + processed_diff)
+                timex.tid = f"t{tid_i}"
+                tid_i += 1
+                yield timex
+
+            processed_committed_i += processed_end_i - processed_start_i
+
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) - committed_i >= window_size + overlap:
+                commit_end_i = committed_i + window_size
+                yield from parse_window(commit_end_i)
+                committed_i = commit_end_i
+
+            # 左側の文脈として必要な分だけを残す
+            trim_i = max(0, committed_i - overlap)
+            if trim_i:
+                buffer = buffer[trim_i:]
+                buffer_offset += trim_i
+                committed_i -= trim_i
 
-    def _normalize_number(self, raw_text: str) -> str:
+        if len(buffer) > committed_i:
+            yield from parse_window(len(buffer))
+
+    def _compile_trigger_char(self) -> Optional[re.Pattern]:
+        """すべてのパターンのマッチに必要な文字のいずれかを検出する正規表現を作成する
+
+        パターンのマッチに必要な文字は正規化後の文字列に対するものであるため、
+        正規化前の文字列でそれらの文字になりうる文字(全角数字や漢数字など)も含める
+
+        Returns:
+            Optional[re.Pattern]: 必要な文字のいずれかを検出する正規表現。必要な文字を特定できないパターンがある場合はNone
+        """
+        trigger_chars: Set[str] = set()
+        for pattern_matcher in self.pattern_matchers.values():
+            if not pattern_matcher.requires_trigger:
+                return None
+            trigger_chars |= pattern_matcher.trigger_chars
+
+        source_chars = self.number_normalizer.get_source_chars(trigger_chars)
+        return compile_pattern("[" + "".join(re.escape(char) for char in sorted(source_chars)) + "]")
+
+    def _get_processed_text(self, raw_text: str) -> str:
+        """parse_with_context()と同じ規則で、入力文字列から正規化後の文字列を求める
+
+        Args:
+            raw_text (str): 入力文字列
+
+        Returns:
+            str: 正規化後の文字列
+        """
+        if self.re_trigger_char and not self.re_trigger_char.search(raw_text):
+            return raw_text
+        processed_text, _ = self._normalize_number(raw_text)
+        return processed_text
+
+    def _normalize_number(self, raw_text: str) -> Tuple[str, OffsetMap]:
         """数字の表記ゆれを正規化するする
 
         NumberNormalizerはコンストラクタ内でset_ignore_kansuji()メソッドにより、漢数字を変換するかどうかのフラグが付与される
@@ -86,88 +569,144 @@ class TimexParser:
             raw_text (str): 入力文字列
 
         Returns:
-            str: 正規化された入力文字列
+            Tuple[str, OffsetMap]: 正規化された入力文字列と、正規化前後のインデックスの対応
         """
-        return self.number_normalizer.normalize(raw_text)
+        return self.number_normalizer.normalize_with_offset_map(raw_text)
+
+    def _iter_ordered_candidates(self, processed_text: str) -> Iterator[Candidate]:
+        """入力文字列から候補となるCandidateを、重複除去で優先する順に逐次的に抽出する
 
-    def _extract(self, processed_text: str) -> List[Extract]:
-        """入力文字列から候補となるExtractをすべて抽出する
+        パターンごとにマッチの範囲を出現順に返すイテレータを作り、それらをヒープでマージする。
+        すべての候補を一度にリストにして並べ替えることはせず、候補ごとのre.Matchも生成しない
+
+        Candidateはタプルとしての比較順が下記の順序となる
+        開始位置の小さい順 → 文字列の長い順 → type_nameの昇順(abstime→custom→duration→reltime→set) → taggerとパターンの順
 
         Args:
             processed_text (str): 入力文字列
 
         Returns:
-            List[Extract]: 抽出されたExtract
+            Iterator[Candidate]: 抽出されたCandidate
         """
-        all_extracts = []
+        if self.pattern_profiler is not None:
+            return iter(sorted(self._extract_with_profiler(processed_text, self.pattern_profiler)))
 
-        # すべてのtaggerのパターンの正規表現を順に適用していく
-        for type_name, patterns in self.all_patterns.items():
-            for pattern in patterns:
-                # 文字列中からのパターン検知
-                re_iter = re.finditer(pattern.re_pattern, processed_text)
-                for re_match in re_iter:
-                    all_extracts.append(Extract(type_name=type_name, re_match=re_match, pattern=pattern))
-        return all_extracts
+        # 文字列中に含まれる文字によって、適用するパターンを絞り込む
+        text_chars = set(processed_text)
+
+        candidate_iters = []
+        pattern_offset = 0
+        for type_name, pattern_matcher in self.pattern_matchers.items():
+            type_id = self.type_names.index(type_name)
+            for pattern_i, spans in pattern_matcher.iter_pattern_spans(processed_text, text_chars):
+                candidate_iters.append(self._iter_candidates(spans, type_id, pattern_offset + pattern_i))
+            pattern_offset += len(pattern_matcher.patterns)
+        return heapq.merge(*candidate_iters)
 
-    def _extract_filter(self, extracts: List[Extract], processed_text: str) -> List[Extract]:
-        """候補Extractの中から必要なものだけをフィルタリングする
+    @staticmethod
+    def _iter_candidates(spans: Iterator[Tuple[int, int]], type_id: int, pattern_id: int) -> Iterator[Candidate]:
+        for start_i, end_i in spans:
+            yield start_i, start_i - end_i, type_id, pattern_id
+
+    def _extract_with_profiler(self, processed_text: str, pattern_profiler: PatternProfiler) -> List[Candidate]:
+        """パターンごとに走査時間を計測しながら、入力文字列から候補となるCandidateをすべて抽出する
 
         Args:
-            extracts (List[Extract]): 候補となるExtractのリスト
             processed_text (str): 入力文字列
+            pattern_profiler (PatternProfiler): 計測結果を記録するPatternProfiler
 
         Returns:
-            List[Extract]: フィルタされたExtractのリスト
+            List[Candidate]: 抽出されたCandidate
         """
-        results = []
-        for extract in extracts:
-            allow_append = True
-            for pattern_filter in self.pattern_filters:
-                if pattern_filter.filter(extract, processed_text):
-                    allow_append = False
-            if allow_append:
-                results.append(extract)
+        all_candidates: List[Candidate] = []
+        pattern_id = 0
+        for type_name, patterns in self.all_patterns.items():
+            type_id = self.type_names.index(type_name)
+            for pattern in patterns:
+                re_compiled = self.compiled_pattern_list[pattern_id]
+                scan_start = time.perf_counter()
+                spans = [re_match.span() for re_match in re_compiled.finditer(processed_text)]
+                pattern_profiler.record_scan(type_name, pattern, time.perf_counter() - scan_start, len(spans))
 
-        return results
+                all_candidates.extend(self._iter_candidates(iter(spans), type_id, pattern_id))
+                pattern_id += 1
+        return all_candidates
 
-    def _drop_duplicates(self, all_extracts: List[Extract], processed_text: str) -> DefaultDict[str, List[Extract]]:
-        """候補Extractの中から、文字列上の同一箇所から重複して取得してしまった候補を除外する
+    def _select_extracts(
+        self, ordered_candidates: Iterable[Candidate], processed_text: str, stats: Optional[ParseStats] = None
+    ) -> DefaultDict[str, List[Extract]]:
+        """重複除去で優先する順に並んだ候補から、フィルタと重複除去を1回の走査で行い、採用するものを選ぶ
+
+        採用済みの候補と重なる候補は、フィルタを適用せずにその場で除外する。
+        re.Matchを含むExtractは、フィルタを適用する候補についてのみ生成する
 
         Args:
-            all_extracts (List[Extract]): 候補となるExtractのリスト
+            ordered_candidates (Iterable[Candidate]): _iter_ordered_candidates()の順に並んだ候補
             processed_text (str): 入力文字列
+            stats (Optional[ParseStats], optional): 候補数とフィルタごとの除外数、フィルタの判定時間を記録する.
+                Defaults to None.
 
         Returns:
-            DefaultDict[str, List[Extract]]: 重複除去されたExtractのリスト
+            DefaultDict[str, List[Extract]]: 採用されたExtract
         """
-        type2extracts = defaultdict(list)
-        text_coverage_flag = [False] * len(processed_text)
-
-        # 「2000年」「10年」といった年表記に関して、可能性の低いDATEよりDURATIONを優先する
-        filtered_extracts = []
-        for extract in all_extracts:
-            if extract.type_name == "abstime" and extract.re_match.group()[-1] == "年":
-                re_num = re.match("[0-9]+", extract.re_match.group())
+        type2extracts: DefaultDict[str, List[Extract]] = defaultdict(list)
+        pattern_list = self.pattern_list
+        compiled_pattern_list = self.compiled_pattern_list
+        type_names = self.type_names
+        pattern_profiler = self.pattern_profiler
+        # pattern_filtersの変更は、候補ごとではなく解析ごとに一度だけ確認する
+        filter_pipeline = self.filter_pipeline
+        filter_pipeline.sync_filters()
+
+        # 開始位置の順に処理するため、採用済みの範囲と重なるかは、その終了位置の最大値のみで判定できる
+        covered_end_i = 0
+        for start_i, negative_length, type_id, pattern_id in ordered_candidates:
+            if stats:
+                stats.num_extracts += 1
+            end_i = start_i - negative_length
+            type_name = type_names[type_id]
+
+            # 「2000年」「10年」といった年表記に関して、可能性の低いDATEよりDURATIONを優先する
+            if type_name == "abstime" and processed_text.endswith("年", start_i, end_i):
+                re_num = re.match("[0-9]+", processed_text[start_i:end_i])
                 # 100年以下の場合は暦の日付表現より持続時間表現を表すと決め、abstimeは利用しない
                 # NOTE: 100年という値は決め打ち
                 # NOTE: 年の場合はabstimeとdurationどちらでも取得されるという前提のもと、もう片方のdurationがあるかは確認しない
                 if re_num and int(re_num.group()) <= 100:
                     continue
-            filtered_extracts.append(extract)
-
-        # 下記の順序を元に重複を削除していく
-        # 開始位置の小さい順 → 文字列の長い順 → type_nameの降順(abstime→duration→reltime→set)
-        ordered_extracts = sorted(
-            filtered_extracts, key=lambda x: (x.re_match.span()[0], -len(x.re_match.group()), x.type_name)
-        )
-        for target_extract in ordered_extracts:
-            start_i, end_i = target_extract.re_match.span()
 
             # すべてがまだ未使用のcharだった場合に候補に加える
-            if any(text_coverage_flag[start_i:end_i]) is False:
-                text_coverage_flag[start_i:end_i] = [True] * (end_i - start_i)
-                type2extracts[target_extract.type_name].append(target_extract)
+            # PatternProfilerを用いる場合は、フィルタによる除外数を記録するため、重なる候補にもフィルタを適用する
+            is_covered = start_i < covered_end_i and start_i != end_i
+            if is_covered and pattern_profiler is None:
+                continue
+
+            # 走査で求めた範囲と同じ位置から再度マッチさせ、re.Matchを得る
+            pattern = pattern_list[pattern_id]
+            re_match = compiled_pattern_list[pattern_id].match(processed_text, start_i)
+            if re_match is None:
+                # 走査と同じ正規表現を用いるため、通常は発生しない
+                raise RuntimeError(f"{pattern} does not match at {start_i} in the same way as the scan")
+            extract = Extract(type_name=type_name, re_match=re_match, pattern=pattern)
+
+            if stats:
+                filter_start = time.perf_counter()
+                rejecting_filter = filter_pipeline.find_rejecting_filter(extract, processed_text)
+                stats.add_stage_time("extract_filter", time.perf_counter() - filter_start)
+            else:
+                rejecting_filter = filter_pipeline.find_rejecting_filter(extract, processed_text)
+            if rejecting_filter is not None:
+                if stats:
+                    stats.num_filtered[type(rejecting_filter).__name__] += 1
+                continue
+            if pattern_profiler is not None:
+                pattern_profiler.record_filtered_survivors([extract])
+                if is_covered:
+                    continue
+                pattern_profiler.record_survivors([extract])
+
+            covered_end_i = max(covered_end_i, end_i)
+            type2extracts[type_name].append(extract)
 
         return type2extracts
 
@@ -206,25 +745,27 @@ class TimexParser:
         Returns:
             List[TIMEX]: 情報が付与されたTIMEXのリスト
         """
-        index2timex_i = {}
-        for timex_i, timex in enumerate(timex_tags):
-            if not timex.span:
-                continue
-            for index in range(timex.span[0], timex.span[1]):
-                index2timex_i[index] = timex_i
+        # 空でない範囲を持つTIMEXを開始位置の順に並べ、ある位置を含むTIMEXを二分探索で求める
+        # 重複除去の後のため、TIMEXの範囲どうしは重ならない
+        sorted_spans = sorted(
+            (timex.span[0], timex.span[1], timex_i)
+            for timex_i, timex in enumerate(timex_tags)
+            if timex.span and timex.span[0] < timex.span[1]
+        )
+        span_starts = [span_start_i for span_start_i, _, _ in sorted_spans]
 
         for timex in timex_tags:
             if not timex.span:
                 continue
 
-            range_expression = detect_range_expression_before_timex(timex.span[0], processed_text)
+            range_expression = self.range_expression_matcher.find_before(timex.span[0], processed_text)
             if not range_expression:
                 continue
 
             possible_timex_end_i = timex.span[0] - len(range_expression) - 1
-            possible_timex_i = index2timex_i.get(possible_timex_end_i)
-            if possible_timex_i is not None:
-                start_timex = timex_tags[possible_timex_i]
+            sorted_i = bisect.bisect_right(span_starts, possible_timex_end_i) - 1
+            if sorted_i >= 0 and possible_timex_end_i < sorted_spans[sorted_i][1]:
+                start_timex = timex_tags[sorted_spans[sorted_i][2]]
 
                 if self._is_valid_range_pair(start_timex, timex):
                     start_timex.range_start = True
@@ -250,42 +791,47 @@ class TimexParser:
             if not timex.span:
                 continue
 
-            range_expression = detect_range_expression_before_timex(
-                timex.span[0], processed_text, range_expressions=["〜", "~", "-", "から", ",", "、"]
-            )
+            range_expression = self.abbrev_range_expression_matcher.find_before(timex.span[0], processed_text)
             if not range_expression:
                 continue
 
-            possible_timex_end_i = timex.span[0] - len(range_expression) - 1
-            re_match_num = re.search(r"[0-9\.:：/]+$", processed_text[: possible_timex_end_i + 1])
-            if re_match_num:
-                re_abbrev_suffix = re.search(r"([0-9\.]+)(.+)", timex.text)
-                if not re_abbrev_suffix or not timex.pattern:
-                    continue
-                abbrev_suffix = re_abbrev_suffix.group(2)
-                abbrev_text_origin = re_match_num.group(0)
-
-                abbrev_full_text = abbrev_text_origin + abbrev_suffix
-                re_match = re.fullmatch(timex.pattern.re_pattern, abbrev_full_text)
-                if re_match:
-                    abbrev_timex = timex.pattern.parse_func(re_match, timex.pattern)
-                    # 元のテキストや対応するTIMEXに合わせて変更する
-                    # modとquantは、すでにtimex.patternの中に含まれているので明示的に変更する必要がない
-                    abbrev_timex.text = abbrev_text_origin
-                    abbrev_timex.span = re_match_num.span()
-                    additional_timexes.append(abbrev_timex)
+            if not timex.pattern or not timex.pattern.re_compiled:
+                continue
+            abbrev_suffix = get_abbrev_suffix(timex.text)
+            if not abbrev_suffix:
+                continue
+
+            # 接続表現の直前から前方へ数字をたどり、単位が省略された数字を取得する
+            abbrev_end_i = timex.span[0] - len(range_expression)
+            abbrev_start_i = find_abbrev_number_start(abbrev_end_i, processed_text)
+            if abbrev_start_i == abbrev_end_i:
+                continue
+            abbrev_text_origin = processed_text[abbrev_start_i:abbrev_end_i]
+
+            abbrev_full_text = abbrev_text_origin + abbrev_suffix
+            re_match = timex.pattern.re_compiled.fullmatch(abbrev_full_text)
+            if re_match:
+                abbrev_timex = timex.pattern.parse_func(re_match, timex.pattern)
+                # 元のテキストや対応するTIMEXに合わせて変更する
+                # modとquantは、すでにtimex.patternの中に含まれているので明示的に変更する必要がない
+                abbrev_timex.text = abbrev_text_origin
+                abbrev_timex.span = (abbrev_start_i, abbrev_end_i)
+                additional_timexes.append(abbrev_timex)
 
         return timex_tags + additional_timexes
 
-    def _modify_additional_information(self, timex_tags: List[TIMEX]) -> List[TIMEX]:
+    def _modify_additional_information(
+        self, timex_tags: List[TIMEX], reference: Optional[pendulum.DateTime]
+    ) -> List[TIMEX]:
         """TIMEXタグに追加の情報を付与する
 
         付与される情報
         - @tid: ドキュメントに対して抽出されたTIMEXの通し番号
-        - reference: 基準日時 (TimexParser.referenceに指定されていた場合)
+        - reference: 基準日時 (referenceが指定されていた場合)
 
         Args:
             timex_tags (List[TIMEX]): TIMEXのリスト
+            reference (Optional[pendulum.DateTime]): 基準日時
 
         Returns:
             List[TIMEX]: 情報が付与されたTIMEXのリスト
@@ -295,33 +841,31 @@ class TimexParser:
         sorted_timex_tags = sorted(timex_tags, key=lambda x: x.span[0] if x.span else 0)
         for i, timex in enumerate(sorted_timex_tags):
             timex.tid = f"t{i}"
-            if self.reference:
-                timex.reference = self.reference
+            if reference:
+                timex.reference = reference
             modified_tags.append(timex)
 
         return modified_tags
 
-    def _adjust_normalize_index_diff(self, timex_tags: List[TIMEX], diff_index_list: List[DiffIndex]) -> List[TIMEX]:
+    def _adjust_normalize_index_diff(
+        self, timex_tags: List[TIMEX], offset_map: OffsetMap, raw_text: str
+    ) -> List[TIMEX]:
         """文字列の正規化により生じたspanの差を修正する
 
         Args:
             timex_tags (List[TIMEX]): TIMEXのリスト
-            diff_index_list (List[DiffIndex]): number_normalizerに記録されたインデックスの差分リスト
+            offset_map (OffsetMap): number_normalizerに記録された正規化前後のインデックスの対応
+            raw_text (str): 正規化前の入力文字列
 
         Returns:
             List[TIMEX]: spanが修正されたTIMEXのリスト
         """
         adjusted_tags = []
-        if diff_index_list:
+        if offset_map:
             for timex_tag in timex_tags:
-                start_i, end_i = timex_tag.span
-                for diff_index in diff_index_list:
-                    if diff_index.index < start_i:
-                        start_i += diff_index.diff
-                    if diff_index.index < end_i:
-                        end_i += diff_index.diff
+                start_i, end_i = offset_map.to_raw_span(timex_tag.span)
                 timex_tag.raw_span = (start_i, end_i)
-                timex_tag.raw_text = self.raw_text[start_i:end_i]
+                timex_tag.raw_text = raw_text[start_i:end_i]
 
                 adjusted_tags.append(timex_tag)
         else:
@@ -329,7 +873,7 @@ class TimexParser:
             for timex_tag in timex_tags:
                 start_i, end_i = timex_tag.span
                 timex_tag.raw_span = (start_i, end_i)
-                timex_tag.raw_text = self.raw_text[start_i:end_i]
+                timex_tag.raw_text = raw_text[start_i:end_i]
                 adjusted_tags.append(timex_tag)
         return adjusted_tags
 
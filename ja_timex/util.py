@@ -1,4 +1,6 @@
-from typing import List, Optional, Union
+import re
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple, Union
 
 import pendulum
 from pendulum.tz.timezone import Timezone
@@ -26,20 +28,116 @@ def set_timezone(tz: Union[str, Timezone]) -> Timezone:
     return default_timezone
 
 
+# TIMEXの直前にある場合に、前のTIMEXとの範囲表現を構成する表現
+RANGE_EXPRESSIONS = ("〜", "~", "-", "から", "から翌", "から同")
+# 単位が省略された数字とTIMEXをつなぐ表現。e.g. "1,2ヶ月", "2から3日"
+ABBREV_RANGE_EXPRESSIONS = ("〜", "~", "-", "から", ",", "、")
+
+
+class RangeExpressionMatcher:
+    """文字列中のある位置の直前にある、範囲表現などの接続表現を検出する
+
+    すべての表現を末尾に固定した一つの正規表現にまとめてコンパイルしておき、
+    表現の最大長の範囲のみを一度だけ照合する。そのため、表現の数によらず照合のコストは変わらない
+    """
+
+    def __init__(self, range_expressions: Sequence[str]) -> None:
+        """
+        Args:
+            range_expressions (Sequence[str]): 検出する表現
+
+        Raises:
+            ValueError: 表現が空の場合
+        """
+        if not range_expressions or not all(range_expressions):
+            raise ValueError("range_expressions must be non-empty strings")
+        self.range_expressions = tuple(range_expressions)
+        self.max_len = max(len(r) for r in self.range_expressions)
+        self.re_suffix = re.compile("(?:" + "|".join(re.escape(r) for r in self.range_expressions) + r")\Z")
+
+    def find_before(self, end_i: int, text: str) -> Optional[str]:
+        """text[:end_i]の末尾にある表現を検出する。複数の表現が当てはまる場合は最も長いものを返す
+
+        Args:
+            end_i (int): 表現の終了位置
+            text (str): 入力文字列
+
+        Returns:
+            Optional[str]: 検出された表現。ない場合はNone
+        """
+        re_match = self.re_suffix.search(text, max(end_i - self.max_len, 0), end_i)
+        return re_match.group() if re_match else None
+
+
+@lru_cache(maxsize=None)
+def get_range_expression_matcher(range_expressions: Tuple[str, ...]) -> RangeExpressionMatcher:
+    """表現の組み合わせごとに、RangeExpressionMatcherを一度だけ構築して共有する
+
+    Args:
+        range_expressions (Tuple[str, ...]): 検出する表現
+
+    Returns:
+        RangeExpressionMatcher: 構築済みのRangeExpressionMatcher
+    """
+    return RangeExpressionMatcher(range_expressions)
+
+
+# 単位が省略された数字を構成する文字
+ABBREV_NUMBER_CHARS = frozenset("0123456789.:：/")
+re_abbrev_suffix = re.compile(r"([0-9\.]+)(.+)")
+
+
+def find_abbrev_number_start(end_i: int, text: str) -> int:
+    """text[:end_i]の末尾に連続する、単位が省略された数字の開始位置を求める
+
+    文字列をコピーせずに終了位置から前方へたどるため、コストは数字の長さのみに比例する
+
+    Args:
+        end_i (int): 数字の終了位置
+        text (str): 入力文字列
+
+    Returns:
+        int: 数字の開始位置。数字がない場合はend_iを返す
+    """
+    start_i = end_i
+    while start_i > 0 and text[start_i - 1] in ABBREV_NUMBER_CHARS:
+        start_i -= 1
+    return start_i
+
+
+@lru_cache(maxsize=4096)
+def get_abbrev_suffix(timex_text: str) -> Optional[str]:
+    """TIMEXの文字列から、省略された数字に補う単位の部分を取得する
+
+    e.g. "2ヶ月" -> "ヶ月"
+
+    Args:
+        timex_text (str): TIMEXの文字列
+
+    Returns:
+        Optional[str]: 数字に続く単位の部分。ない場合はNone
+    """
+    re_match = re_abbrev_suffix.search(timex_text)
+    return re_match.group(2) if re_match else None
+
+
 def detect_range_expression_before_timex(
     span_start_i: int,
     text: str,
-    range_expressions: List[str] = [
-        "〜",
-        "~",
-        "-",
-        "から",
-        "から翌",
-        "から同",
-    ],
+    range_expressions: Union[RangeExpressionMatcher, Sequence[str]] = RANGE_EXPRESSIONS,
 ) -> Optional[str]:
-    maxlen_range_expression = max([len(r) for r in range_expressions])
-    for range_expression in range_expressions:
-        if text[span_start_i - maxlen_range_expression : span_start_i].endswith(range_expression):
-            return range_expression
-    return None
+    """TIMEXの直前にある範囲表現を検出する
+
+    Args:
+        span_start_i (int): TIMEXの開始位置
+        text (str): 入力文字列
+        range_expressions (Union[RangeExpressionMatcher, Sequence[str]], optional):
+            検出する表現。表現のリストの場合は、対応するRangeExpressionMatcherを取得して用いる.
+            Defaults to RANGE_EXPRESSIONS.
+
+    Returns:
+        Optional[str]: 検出された表現。ない場合はNone
+    """
+    if not isinstance(range_expressions, RangeExpressionMatcher):
+        range_expressions = get_range_expression_matcher(tuple(range_expressions))
+    return range_expressions.find_before(span_start_i, text)
@@ -69,3 +69,28 @@ def test_without_custom_tagger():
     assert timexes[1].value == "2681-XX-XX"
     assert timexes[1].text == "2681年"
     assert timexes[1].parsed == {"calendar_day": "XX", "calendar_month": "XX", "calendar_year": "2681"}
+
+
+def test_custom_tagger_global_flags():
+    # グローバルなフラグを持つパターンも利用できる
+    def parse_kouki(re_match: re.Match, pattern: Pattern) -> TIMEX:
+        year = int(re_match.group("calendar_year")) - 660
+        return TIMEX(
+            type="DATE",
+            value=f"{year}-XX-XX",
+            text=re_match.group(),
+            parsed=re_match.groupdict(),
+            span=re_match.span(),
+            pattern=pattern,
+        )
+
+    class CustomTagger(BaseTagger):
+        def __init__(self) -> None:
+            self.patterns = [
+                Pattern(re_pattern="(?m)^皇紀(?P<calendar_year>[0-9]{1,4})年", parse_func=parse_kouki, option={})
+            ]
+
+    p = TimexParser(custom_tagger=CustomTagger())
+    timexes = p.parse("西暦2021年は\n皇紀2681年です")
+    assert [timex.text for timex in timexes] == ["西暦2021年", "皇紀2681年"]
+    assert timexes[1].value == "2021-XX-XX"
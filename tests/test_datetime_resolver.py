@@ -0,0 +1,71 @@
+import pendulum
+import pytest
+
+from ja_timex.datetime_resolver import resolve_datetime64, resolve_datetimes
+from ja_timex.tag import TIMEX
+from ja_timex.timex import TimexParser
+
+
+@pytest.fixture(scope="module")
+def p_ref():
+    return TimexParser(reference=pendulum.datetime(2021, 7, 18, tz="Asia/Tokyo"))
+
+
+def test_resolve_datetimes(p_ref):
+    timexes = p_ref.parse("2021年7月18日の18時20分から3日後、8月1日まで")
+    timexes += [timex.to_compact() for timex in timexes]
+    assert resolve_datetimes(timexes) == [timex.to_datetime() for timex in timexes]
+    assert None not in resolve_datetimes(timexes)
+
+
+def test_resolve_datetimes_reference():
+    timexes = TimexParser().parse("18時20分に集合して、3日後に解散")
+    assert resolve_datetimes(timexes) == [None, None]
+
+    # 引数のreferenceは各TIMEXのreferenceより優先される
+    reference = pendulum.datetime(2021, 7, 18, tz="Asia/Tokyo")
+    assert resolve_datetimes(timexes, reference=reference) == [
+        pendulum.datetime(2021, 7, 18, 18, 20, tz="Asia/Tokyo"),
+        pendulum.datetime(2021, 7, 21, tz="Asia/Tokyo"),
+    ]
+
+
+def test_resolve_datetimes_now():
+    timexes = TimexParser().parse("7月18日")
+    assert resolve_datetimes(timexes, now=pendulum.datetime(2000, 1, 1)) == [
+        pendulum.datetime(2000, 7, 18, tz="Asia/Tokyo")
+    ]
+    assert resolve_datetimes(timexes, tz="UTC", now=pendulum.datetime(2000, 1, 1)) == [
+        pendulum.datetime(2000, 7, 18, tz="UTC")
+    ]
+
+
+def test_resolve_datetimes_errors():
+    invalid = TIMEX(
+        type="DATE",
+        value="2021-02-30",
+        text="2021年2月30日",
+        span=(0, 10),
+        parsed={"calendar_year": "2021", "calendar_month": "02", "calendar_day": "30"},
+    )
+    valid = TimexParser().parse("2021年7月18日")[0]
+
+    with pytest.raises(ValueError):
+        resolve_datetimes([valid, invalid])
+    assert resolve_datetimes([valid, invalid], errors="coerce") == [
+        pendulum.datetime(2021, 7, 18, tz="Asia/Tokyo"),
+        None,
+    ]
+    with pytest.raises(ValueError):
+        resolve_datetimes([valid], errors="ignore")
+
+
+def test_resolve_datetime64():
+    np = pytest.importorskip("numpy")
+
+    timexes = TimexParser().parse("2021年7月18日から毎日")
+    values, valid = resolve_datetime64(timexes, tz="UTC")
+    assert values.dtype == np.dtype("datetime64[s]")
+    assert list(valid) == [True, False]
+    assert values[0] == np.datetime64("2021-07-18T00:00:00")
+    assert np.isnat(values[1])
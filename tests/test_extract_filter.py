@@ -1,6 +1,17 @@
+import json
+import pickle
 import re
-
-from ja_timex.extract_filter import DecimalFilter, NumexpFilter, PartialNumFilter, PartialPhraseFilter
+from concurrent.futures import ThreadPoolExecutor
+
+from ja_timex.extract_filter import (
+    BaseFilter,
+    DecimalFilter,
+    FilterPipeline,
+    NumexpFilter,
+    PartialNumFilter,
+    PartialPhraseAffix,
+    PartialPhraseFilter,
+)
 from ja_timex.pattern.place import Pattern
 from ja_timex.tag import Extract
 
@@ -34,6 +45,18 @@ def test_numexp_filter():
     assert not f.filter(make_extract("2020.7.18", "2020.7.18円相場は"), "2020.7.18円相場は")  # 単位が付いていた場合も同様
 
 
+def test_numexp_filter_add_units():
+    f = NumexpFilter()
+    assert not f.filter(make_extract("7.18", "7.18光年"), "7.18光年")
+
+    f.add_units(["光年", "天文単位"])
+    assert f.filter(make_extract("7.18", "7.18光年"), "7.18光年")
+    assert f.filter(make_extract("7.18", "7.18 天文単位"), "7.18 天文単位")
+
+    # 単位の照合は対象パターンの直後からのみ行う
+    assert not f.filter(make_extract("7.18", "7.18の距離は3光年"), "7.18の距離は3光年")
+
+
 def test_partial_num_filter():
     f = PartialNumFilter()
     # 前後に数字または+がある場合
@@ -81,3 +104,104 @@ def test_partial_phrase_filter():
 
     assert not f.filter(make_extract("3年", "石の上に3年と言いますが"), "石の上に3年と言いますが")  # 一部文字が変わっている場合
     assert not f.filter(make_extract("三年", "石の上に三年と言いますが"), "石の上に三年と言いますが")  # 一部文字が変わっている場合
+
+
+def test_partial_phrase_filter_add_phrases(tmp_path):
+    f = PartialPhraseFilter()
+    assert not f.filter(make_extract("1日", "1日乗車券"), "1日乗車券")
+
+    f.add_phrases([PartialPhraseAffix(timex_text="1日", target_affix="乗車券", type="suffix")])
+    assert f.filter(make_extract("1日", "1日乗車券"), "1日乗車券")
+
+    # 辞書ファイルからまとめて追加する
+    dictionary = [{"timex_text": f"{i}時", "target_affix": f"駅{i}", "type": "prefix"} for i in range(10000)]
+    dictionary_path = tmp_path / "phrases.json"
+    dictionary_path.write_text(json.dumps(dictionary, ensure_ascii=False), encoding="utf8")
+    f.load_dictionary(dictionary_path)
+
+    assert f.filter(make_extract("1234時", "駅12341234時"), "駅12341234時")
+    assert not f.filter(make_extract("1234時", "駅12351234時"), "駅12351234時")
+    # 文字列の先頭より前は参照しない
+    assert not f.filter(make_extract("1時", "1時駅1"), "1時駅1")
+
+
+class CountFilter(BaseFilter):
+    def __init__(self, reject: bool, cost: float = 1.0, rejection_rate: float = 0.01) -> None:
+        self.reject = reject
+        self.cost = cost
+        self.rejection_rate = rejection_rate
+        self.num_calls = 0
+
+    def filter(self, extract, text):
+        self.num_calls += 1
+        return self.reject
+
+
+def test_filter_pipeline_short_circuit():
+    first = CountFilter(reject=True)
+    second = CountFilter(reject=True)
+    pipeline = FilterPipeline([first, second])
+
+    extract = make_extract("7.18", "7.18は晴れ")
+    assert pipeline.find_rejecting_filter(extract, "7.18は晴れ") is first
+    assert (first.num_calls, second.num_calls) == (1, 0)
+
+
+def test_filter_pipeline_declared_order():
+    expensive = CountFilter(reject=False, cost=10.0)
+    rarely_rejects = CountFilter(reject=False, rejection_rate=0.001)
+    cheap_and_selective = CountFilter(reject=False, rejection_rate=0.5)
+    filters = [expensive, rarely_rejects, cheap_and_selective]
+    pipeline = FilterPipeline(filters)
+    assert pipeline.ordered_filters == [cheap_and_selective, expensive, rarely_rejects]
+
+    # フィルタの追加はsync_filters()の呼び出し時に反映される
+    added = CountFilter(reject=True, rejection_rate=1.0)
+    filters.append(added)
+    pipeline.sync_filters()
+    extract = make_extract("7.18", "7.18は晴れ")
+    assert pipeline.find_rejecting_filter(extract, "7.18は晴れ") is added
+    assert pipeline.ordered_filters[0] is added
+
+    # 同じ位置のフィルタを置き換えた場合も反映される
+    replaced = CountFilter(reject=True)
+    filters[filters.index(added)] = replaced
+    pipeline.sync_filters()
+    assert pipeline.find_rejecting_filter(extract, "7.18は晴れ") is replaced
+    assert added not in pipeline.ordered_filters
+
+
+def test_filter_pipeline_adaptive():
+    # 宣言された値では先に適用されるが、実際には除外しないフィルタ
+    never_rejects = CountFilter(reject=False, rejection_rate=0.9)
+    always_rejects = CountFilter(reject=True, rejection_rate=0.001)
+    pipeline = FilterPipeline(
+        [never_rejects, always_rejects], adaptive=True, reorder_interval=50, timing_interval=1, min_calls=10
+    )
+    assert pipeline.ordered_filters == [never_rejects, always_rejects]
+
+    extract = make_extract("7.18", "7.18は晴れ")
+    for _ in range(100):
+        assert pipeline.find_rejecting_filter(extract, "7.18は晴れ") is always_rejects
+    assert pipeline.ordered_filters == [always_rejects, never_rejects]
+    assert pipeline.stats[id(always_rejects)].num_rejections == 100
+    assert never_rejects.num_calls < 100
+
+
+def test_filter_pipeline_adaptive_threads():
+    always_rejects = CountFilter(reject=True, rejection_rate=0.001)
+    never_rejects = CountFilter(reject=False, rejection_rate=0.9)
+    pipeline = FilterPipeline([never_rejects, always_rejects], adaptive=True, reorder_interval=7, min_calls=10)
+
+    # 複数のスレッドから同時に判定しても、統計の更新は失われない
+    extract = make_extract("7.18", "7.18は晴れ")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in executor.map(lambda _: pipeline.find_rejecting_filter(extract, "7.18は晴れ"), range(2000)):
+            pass
+    assert pipeline.num_candidates == 2000
+    assert pipeline.stats[id(always_rejects)].num_rejections == 2000
+    assert pipeline.stats[id(always_rejects)].num_calls == always_rejects.num_calls == 2000
+
+    # ロックを持つが、pickleできる
+    restored = pickle.loads(pickle.dumps(pipeline))
+    assert restored.find_rejecting_filter(extract, "7.18は晴れ") is not None
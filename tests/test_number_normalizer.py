@@ -1,6 +1,6 @@
 import pytest
 
-from ja_timex.number_normalizer import NumberNormalizer, kansuji2number
+from ja_timex.number_normalizer import NumberNormalizer, OffsetMap, kansuji2number
 
 
 @pytest.fixture(scope="module")
@@ -18,6 +18,7 @@ def test_normalize_zen_to_han(nn):
     # 数字の間にはいる,や.の全角文字
     assert nn._normalize_zen_to_han("１，０００年") == "1,000年"
     assert nn._normalize_zen_to_han("１．０時間") == "1.0時間"
+    assert nn._normalize_zen_to_han("１，２３４，５６７年と１．５時間") == "1,234,567年と1.5時間"
 
     assert nn._normalize_zen_to_han("通常の句点．または句読点，は変換しない") == "通常の句点．または句読点，は変換しない"
 
@@ -227,3 +228,48 @@ def test_normalize_multiple_expression(nn):
 
     # 「創聖のアクエリオン」 AKINO
     assert nn._normalize_kansuji("一万年と二千年前から愛してる八千年過ぎた頃からもっと恋しくなった") == "10000年と2000年前から愛してる8000年過ぎた頃からもっと恋しくなった"
+
+
+def test_get_source_chars(nn):
+    assert nn.get_source_chars({"年"}) == {"年"}
+    assert nn.get_source_chars({":", "時"}) == {":", "時"}
+
+    source_chars = nn.get_source_chars({"1", "."})
+    assert {"1", "１", "一", "十", "万", ".", "．"} <= source_chars
+
+
+def test_normalize_with_offset_map():
+    nn = NumberNormalizer()
+    text, offset_map = nn.normalize_with_offset_map("明治二十六年から30,000年、千年")
+    assert text == "明治26年から30000年、1000年"
+
+    # 置換箇所の前後は、置換箇所からの距離で対応付ける
+    assert offset_map.to_raw_span((0, 5)) == (0, 6)
+    assert offset_map.to_raw_span((7, 13)) == (8, 15)
+    assert offset_map.to_raw_span((14, 19)) == (16, 18)
+    assert offset_map.to_processed(8) == 7
+    assert offset_map.to_processed(15) == 13
+
+    # 置換箇所の途中を指す場合は、置換箇所全体に対応付ける
+    assert offset_map.to_raw_span((16, 19)) == (16, 18)
+
+    # 長さが変わらない正規化は記録しない
+    text, offset_map = nn.normalize_with_offset_map("２０２１年")
+    assert text == "2021年"
+    assert len(offset_map) == 0
+
+
+def test_offset_map_compose():
+    # "三,000" → "3,000" → "3000"
+    first = OffsetMap()
+    second = OffsetMap()
+    second.add(0, 5, 0, 4)
+    assert OffsetMap.compose(first, second) is second
+
+    # "千,000" → "1000,000" → "1000000"
+    first.add(0, 1, 0, 4)
+    second = OffsetMap()
+    second.add(0, 8, 0, 7)
+    offset_map = OffsetMap.compose(first, second)
+    assert len(offset_map) == 1
+    assert offset_map.to_raw_span((0, 7)) == (0, 5)
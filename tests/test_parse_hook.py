@@ -0,0 +1,59 @@
+from ja_timex.parse_hook import BaseParseHook, ParseStats
+from ja_timex.timex import TimexParser
+
+
+class RecordHook(BaseParseHook):
+    def __init__(self, record: bool = True) -> None:
+        self.record = record
+        self.stats_list = []
+
+    def should_record(self, raw_text: str) -> bool:
+        return self.record
+
+    def on_parse(self, stats: ParseStats) -> None:
+        self.stats_list.append(stats)
+
+
+def test_parse_hook():
+    hook = RecordHook()
+    p = TimexParser(parse_hook=hook)
+
+    timexes = p.parse("2021年7月18日から3日間、7-8メートル")
+    assert len(hook.stats_list) == 1
+
+    stats = hook.stats_list[0]
+    assert stats.text_length == len("2021年7月18日から3日間、7-8メートル")
+    assert list(stats.stage_times) == [
+        "normalize",
+        "extract",
+        "extract_filter",
+        "drop_duplicates",
+        "parse",
+        "post_process",
+        "adjust_index",
+    ]
+    assert all(t >= 0 for t in stats.stage_times.values())
+    # フィルタを適用した候補があるため、フィルタの判定時間が記録される
+    assert stats.stage_times["extract_filter"] > 0
+    assert stats.total_time == sum(stats.stage_times.values())
+
+    assert stats.num_timexes == len(timexes) == 2
+    assert stats.num_filtered["NumexpFilter"] == 2
+    assert stats.num_extracts == stats.num_timexes + sum(stats.num_filtered.values()) + stats.num_dropped
+
+
+def test_parse_hook_without_trigger_chars():
+    hook = RecordHook()
+    p = TimexParser(parse_hook=hook)
+
+    assert p.parse("それはどうかな") == []
+    assert hook.stats_list[0].stage_times == {}
+    assert hook.stats_list[0].num_timexes == 0
+
+
+def test_parse_hook_should_not_record():
+    hook = RecordHook(record=False)
+    p = TimexParser(parse_hook=hook)
+
+    assert p.parse("2021年7月18日")[0].value == "2021-07-18"
+    assert hook.stats_list == []
@@ -0,0 +1,112 @@
+import re
+
+import pytest
+
+from ja_timex.pattern.abstime import patterns as abstime_patterns
+from ja_timex.pattern.duration import patterns as duration_patterns
+from ja_timex.pattern.place import Pattern
+from ja_timex.pattern.reltime import patterns as reltime_patterns
+from ja_timex.pattern.set import patterns as set_patterns
+from ja_timex.pattern_matcher import MultiPatternMatcher, get_first_chars, get_required_chars, to_non_capturing
+
+
+def test_get_first_chars():
+    assert get_first_chars("(?P<calendar_year>[0-9]{1,4})年") == frozenset("0123456789")
+    assert get_first_chars("(?P<before_suffix>(前|まえ))") == frozenset("前ま")
+    assert get_first_chars("(午前|午後)?(?P<clock_hour>[0-9])時") == frozenset("午0123456789")
+
+    # 空文字列にマッチしうる場合や、先頭文字を列挙できない場合
+    assert get_first_chars("[0-9]*") is None
+    assert get_first_chars("\\s?[0-9]") is None
+    assert get_first_chars("[^0-9]年") is None
+
+    # グローバルなフラグを持つ場合
+    assert get_first_chars("(?s)皇紀(?P<calendar_year>[0-9]+)年") is None
+    assert get_first_chars("(?m)^皇紀(?P<calendar_year>[0-9]+)年") is None
+    assert get_first_chars("(?x)皇紀 (?P<calendar_year>[0-9]+) 年") is None
+
+
+def test_get_required_chars():
+    assert get_required_chars("(?P<calendar_year>[0-9]{1,4})年") == frozenset("年")
+    assert get_required_chars("(?P<calendar_year>[0-9]{1,4})年(?P<calendar_month>[0-9]{1,2})月") == frozenset("年")
+    assert get_required_chars("(?P<clock_hour>[0-9]{1,2})[:：](?P<clock_minute>[0-9]{2})") == frozenset(":：")
+    assert get_required_chars("(前|まえ)") == frozenset("前ま")
+
+    # 数字しか必須の文字がない場合は数字の集合となる
+    assert get_required_chars("[0-9]+") == frozenset("0123456789")
+    # 省略可能な文字は必須とならない
+    assert get_required_chars("(年)?") is None
+
+
+def test_to_non_capturing():
+    assert to_non_capturing("(?P<calendar_year>[0-9]{1,4})年") == "(?:[0-9]{1,4})年"
+    assert to_non_capturing("(前|まえ)") == "(?:前|まえ)"
+    assert to_non_capturing("\\s{,1}[\\(（]\\s{,1}") == "\\s{,1}[\\(（]\\s{,1}"
+    assert to_non_capturing("[(]") == "[(]"
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [abstime_patterns, duration_patterns, reltime_patterns, set_patterns],
+)
+def test_multi_pattern_matcher_is_same_as_finditer(patterns):
+    matcher = MultiPatternMatcher(patterns)
+    texts = [
+        "2021年7月18日(日)の午前10時30分から3時間、毎週1回、来週の月曜日",
+        "平成元年から令和3年度の第2四半期、紀元前5世紀、18ヶ月前、1日おき",
+        "12,345年と1.5時間、20:30〜21:45、7/18-7/20、約2週間後、今朝9時",
+        "時間表現を含まない文字列",
+    ]
+    for text in texts:
+        expected = [(pattern, m.span()) for pattern in patterns for m in re.finditer(pattern.re_pattern, text)]
+        spans = [(patterns[i], span) for i, pattern_spans in matcher.iter_pattern_spans(text) for span in pattern_spans]
+        assert spans == expected
+
+
+def test_multi_pattern_matcher_overlapping_candidates():
+    patterns = [
+        Pattern(re_pattern="[0-9]+年", parse_func=lambda x: x, option={}),
+        Pattern(re_pattern="[0-9]+", parse_func=lambda x: x, option={}),
+        Pattern(re_pattern="年[0-9]+", parse_func=lambda x: x, option={}),
+    ]
+    matcher = MultiPatternMatcher(patterns)
+
+    results = [
+        (patterns[i].re_pattern, "2021年12月"[start_i:end_i])
+        for i, spans in matcher.iter_pattern_spans("2021年12月")
+        for start_i, end_i in spans
+    ]
+    assert results == [("[0-9]+年", "2021年"), ("[0-9]+", "2021"), ("[0-9]+", "12"), ("年[0-9]+", "年12")]
+
+
+def test_multi_pattern_matcher_global_flags():
+    patterns = [
+        Pattern(re_pattern="(?m)^皇紀(?P<calendar_year>[0-9]+)年", parse_func=lambda x: x, option={}),
+        Pattern(re_pattern="(?s)皇紀(?P<calendar_year>[0-9]+)年", parse_func=lambda x: x, option={}),
+        Pattern(re_pattern="[0-9]+年", parse_func=lambda x: x, option={}),
+    ]
+    matcher = MultiPatternMatcher(patterns)
+
+    text = "西暦2021年\n皇紀2681年"
+    expected = [(pattern, m.span()) for pattern in patterns for m in re.finditer(pattern.re_pattern, text)]
+    spans = [(patterns[i], span) for i, pattern_spans in matcher.iter_pattern_spans(text) for span in pattern_spans]
+    assert spans == expected
+
+
+def test_multi_pattern_matcher_trigger_chars():
+    patterns = [
+        Pattern(re_pattern="[0-9]+年", parse_func=lambda x: x, option={}),
+        Pattern(re_pattern="[0-9]+月", parse_func=lambda x: x, option={}),
+        Pattern(re_pattern="(今|来)週", parse_func=lambda x: x, option={}),
+    ]
+    matcher = MultiPatternMatcher(patterns)
+    assert matcher.trigger_chars == frozenset("年月週")
+
+    # 必須の文字が含まれるパターンのみ適用される
+    assert matcher.get_enabled_group_ids(set("2021年")) == {0}
+    assert matcher.get_enabled_group_ids(set("12月と来週")) == {1, 2}
+    assert matcher.get_enabled_group_ids(set("時間表現なし")) == set()
+
+    spans = [span for _, pattern_spans in matcher.iter_pattern_spans("2021年12月と来週") for span in pattern_spans]
+    assert spans == [(0, 5), (5, 8), (9, 11)]
+    assert matcher.iter_pattern_spans("時間表現なし") == []
@@ -1,6 +1,6 @@
 import pytest
 
-from ja_timex.pattern.place import Place
+from ja_timex.pattern.place import Pattern, Place, compile_pattern
 
 
 @pytest.fixture(scope="module")
@@ -247,3 +247,13 @@ def test_prefix_suffix(place):
     assert place.is_valid("end_suffix", "終わり")
     assert place.is_valid("end_suffix", "末")
     assert place.is_valid("end_suffix", "末日")
+
+
+def test_pattern_compiled_registry():
+    pattern_a = Pattern(re_pattern="(?P<calendar_year>[0-9]{1,4})年", parse_func=lambda x: x, option={})
+    pattern_b = Pattern(re_pattern="(?P<calendar_year>[0-9]{1,4})年", parse_func=lambda x: x, option={})
+
+    # 同一の正規表現の文字列であれば、コンパイル済みの正規表現を共有する
+    assert pattern_a.re_compiled is pattern_b.re_compiled
+    assert pattern_a.re_compiled is compile_pattern("(?P<calendar_year>[0-9]{1,4})年")
+    assert pattern_a.re_compiled.fullmatch("2021年")
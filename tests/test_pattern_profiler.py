@@ -0,0 +1,91 @@
+import pickle
+
+import pytest
+
+from ja_timex.pattern.place import Pattern
+from ja_timex.pattern_profiler import PatternProfile, PatternProfiler
+from ja_timex.tag import TIMEX
+from ja_timex.tagger import BaseTagger
+from ja_timex.timex import TimexParser
+
+
+def test_pattern_profiler():
+    texts = ["2021年7月18日から3日間", "毎週1回、7-8メートル", "それはどうかな"]
+    profiler = PatternProfiler()
+    p = TimexParser(pattern_profiler=profiler)
+    p_default = TimexParser()
+
+    # 計測しても抽出結果は変わらない
+    for text in texts:
+        assert p.parse(text) == p_default.parse(text)
+
+    # 時間表現を含みえない文字列は走査しない
+    num_patterns = sum(len(patterns) for patterns in p.all_patterns.values())
+    assert len(profiler.profiles) == num_patterns
+    assert all(profile.num_calls == 2 for profile in profiler.profiles.values())
+
+    num_survivors = sum(profile.num_survivors for profile in profiler.profiles.values())
+    assert num_survivors == 3
+    for profile in profiler.profiles.values():
+        assert profile.num_matches >= profile.num_filtered_survivors >= profile.num_survivors
+
+
+def test_pattern_profiler_custom_tagger():
+    def parse_kouki(re_match, pattern):
+        year = int(re_match.group("calendar_year")) - 660
+        return TIMEX(type="DATE", value=f"{year}-XX-XX", text=re_match.group(), span=re_match.span(), pattern=pattern)
+
+    custom_pattern = Pattern(re_pattern="皇紀(?P<calendar_year>[0-9]{1,4})年", parse_func=parse_kouki, option={})
+    profiler = PatternProfiler()
+    p = TimexParser(custom_tagger=BaseTagger(patterns=[custom_pattern]), pattern_profiler=profiler)
+    assert p.parse("皇紀2600年")[0].value == "1940-XX-XX"
+
+    custom_profiles = [profile for profile in profiler.profiles.values() if profile.type_name == "custom"]
+    assert len(custom_profiles) == 1
+    assert custom_profiles[0].num_matches == 1
+    assert custom_profiles[0].num_survivors == 1
+
+
+def test_pattern_profiler_report():
+    profiler = PatternProfiler()
+    p = TimexParser(pattern_profiler=profiler)
+    p.parse("2021年7月18日から3日間")
+
+    ranking = profiler.ranking("cost_per_survivor")
+    assert ranking[-1].num_survivors > 0
+    assert [profile.scan_time for profile in profiler.ranking()] == sorted(
+        [profile.scan_time for profile in profiler.profiles.values()], reverse=True
+    )
+
+    report = profiler.report(top_n=3)
+    lines = report.split("\n")
+    assert len(lines) == 4
+    assert lines[0].startswith("rank\ttype")
+    assert lines[1].startswith("1\t")
+
+    with pytest.raises(ValueError):
+        profiler.ranking("unknown")
+
+    profiler.reset()
+    assert profiler.profiles == {}
+
+
+def test_pattern_profile_cost_per_survivor():
+    pattern = Pattern(re_pattern="年", parse_func=lambda x: x, option={})
+    assert PatternProfile(type_name="abstime", pattern=pattern).cost_per_survivor == 0.0
+    assert PatternProfile(type_name="abstime", pattern=pattern, scan_time=1.0).cost_per_survivor == float("inf")
+    profile = PatternProfile(type_name="abstime", pattern=pattern, scan_time=1.0, num_survivors=4)
+    assert profile.cost_per_survivor == 0.25
+
+
+def test_pattern_profiler_pickle():
+    profiler = PatternProfiler()
+    p = TimexParser(pattern_profiler=profiler)
+
+    # 計測結果はプロセス間で共有しないため、復元したTimexParserはpattern_profilerを持たない
+    restored = pickle.loads(pickle.dumps(p))
+    assert restored.pattern_profiler is None
+    assert p.pattern_profiler is profiler
+
+    texts = ["2021年7月18日から3日間", "毎週1回、7-8メートル"]
+    assert p.parse_batch(texts, workers=2) == [TimexParser().parse(text) for text in texts]
@@ -0,0 +1,133 @@
+import pendulum
+
+import ja_timex.result_cache
+from ja_timex.extract_filter import NumexpFilter, PartialPhraseAffix, PartialPhraseFilter
+from ja_timex.result_cache import LRUResultCache, SQLiteResultCache, get_package_fingerprint, make_result_cache_key
+from ja_timex.timex import TimexParser
+
+
+def test_result_cache():
+    cache = LRUResultCache()
+    p = TimexParser(result_cache=cache)
+    p_default = TimexParser()
+
+    texts = ["明治二十六年から明治四十二年まで", "今から30,000年前", "明治二十六年から明治四十二年まで", "それはどうかな"]
+    for text in texts:
+        assert p.parse(text) == p_default.parse(text)
+        assert p.processed_text == p_default.processed_text
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 3)
+    assert cache.hit_rate == 0.25
+
+    # 返されたTIMEXを変更しても、キャッシュの内容は変わらない
+    timexes = p.parse("今から30,000年前")
+    timexes[0].tid = "t100"
+    timexes[0].parsed["year"] = "1"
+    assert p.parse("今から30,000年前") == p_default.parse("今から30,000年前")
+
+
+def test_result_cache_key():
+    cache = LRUResultCache()
+    p = TimexParser(result_cache=cache)
+    p.parse("明日")
+
+    # 基準日時や設定が異なる場合は、別の結果として扱う
+    p.reference = pendulum.datetime(2021, 7, 18, tz="Asia/Tokyo")
+    assert p.parse("明日")[0].to_datetime() == pendulum.datetime(2021, 7, 19, tz="Asia/Tokyo")
+    p.number_normalizer.set_ignore_kansuji(True)
+    p.parse("明日")
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    p_custom = TimexParser(result_cache=cache)
+    fingerprint = p_custom.config_fingerprint
+    p_custom.pattern_filters = p_custom.pattern_filters[:1]
+    assert p_custom.config_fingerprint != fingerprint
+    assert TimexParser().config_fingerprint == fingerprint
+
+    key = make_result_cache_key("明日", None, fingerprint)
+    assert key == make_result_cache_key("明日", None, fingerprint)
+    assert key != make_result_cache_key("明後日", None, fingerprint)
+
+
+def test_result_cache_filter_config_changed():
+    p = TimexParser(result_cache=LRUResultCache())
+    assert [timex.text for timex in p.parse("1日乗車券")] == ["1日"]
+    assert [timex.text for timex in p.parse("7-18光年")] == ["7-18"]
+
+    # 実行時にフィルタの設定を変更した場合は、キャッシュされた結果を返さない
+    partial_phrase_filter = next(f for f in p.pattern_filters if isinstance(f, PartialPhraseFilter))
+    partial_phrase_filter.add_phrases([PartialPhraseAffix(timex_text="1日", target_affix="乗車券", type="suffix")])
+    assert p.parse("1日乗車券") == []
+
+    numexp_filter = next(f for f in p.pattern_filters if isinstance(f, NumexpFilter))
+    numexp_filter.add_units(["光年"])
+    assert p.parse("7-18光年") == []
+
+    p.pattern_filters[p.pattern_filters.index(numexp_filter)] = NumexpFilter()
+    assert [timex.text for timex in p.parse("7-18光年")] == ["7-18"]
+
+
+def test_lru_result_cache_eviction():
+    cache = LRUResultCache(max_entries=2)
+    cache.put(b"a", [])
+    cache.put(b"b", [])
+    assert cache.get(b"a") == []
+    cache.put(b"c", [])
+    # 最も長く参照されていないbが削除される
+    assert cache.get(b"b") is None
+    assert len(cache) == 2
+
+    entry_size = LRUResultCache.estimate_size([])
+    cache = LRUResultCache(max_size=entry_size * 2)
+    for key in [b"a", b"b", b"c"]:
+        cache.put(key, [])
+    assert len(cache) == 2
+    assert cache.size == entry_size * 2
+
+    cache.clear()
+    assert (len(cache), cache.size, cache.hits, cache.misses) == (0, 0, 0, 0)
+
+
+def test_result_cache_with_parse_batch():
+    p = TimexParser(result_cache=LRUResultCache())
+    texts = ["明治二十六年", "毎週3回"] * 3
+    assert p.parse_batch(texts, workers=2) == [p.parse(text) for text in texts]
+
+
+def test_sqlite_result_cache(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    texts = ["明治二十六年から明治四十二年まで", "今から30,000年前", "毎週3回と来週の月曜日", "それはどうかな"]
+    expected = [TimexParser().parse(text) for text in texts]
+
+    with SQLiteResultCache(path, commit_interval=2) as cache:
+        p = TimexParser(result_cache=cache)
+        assert [p.parse(text) for text in texts] == expected
+        assert (cache.hits, cache.misses, len(cache)) == (0, 4, 4)
+
+    # 別のプロセスで開いた場合も、保存した結果を利用できる
+    with SQLiteResultCache(path) as cache:
+        p = TimexParser(result_cache=cache)
+        assert [p.parse(text) for text in texts] == expected
+        assert p.processed_text == "それはどうかな"
+        assert (cache.hits, cache.misses) == (4, 0)
+
+        # 正規化後の文字列は保存せず、キャッシュから結果を返す場合も入力文字列から求め直す
+        p.parse("今から30,000年前")
+        assert p.processed_text == "今から30000年前"
+        values = [row[0] for row in cache._connection.execute("SELECT value FROM results")]
+        assert not any("今から" in value for value in values)
+
+
+def test_sqlite_result_cache_invalidation(tmp_path, monkeypatch):
+    path = tmp_path / "cache.sqlite3"
+    with SQLiteResultCache(path) as cache:
+        TimexParser(result_cache=cache).parse("明日")
+        assert len(cache) == 1
+
+    with SQLiteResultCache(path) as cache:
+        assert len(cache) == 1
+
+    # パターンや辞書が変更された場合は、保存した結果を削除する
+    assert len(get_package_fingerprint()) == 64
+    monkeypatch.setattr(ja_timex.result_cache, "get_package_fingerprint", lambda: "changed")
+    with SQLiteResultCache(path) as cache:
+        assert len(cache) == 0
@@ -1,7 +1,10 @@
+import pickle
+
 import pendulum
 import pytest
 
-from ja_timex.tag import TIMEX
+from ja_timex.pattern.place import Pattern
+from ja_timex.tag import TIMEX, CompactTIMEX
 
 
 @pytest.fixture(scope="module")
@@ -321,3 +324,36 @@ def test_default_timezone():
         timex.to_datetime(tz=None)
     with pytest.raises(TypeError):
         timex.to_datetime(tz=10)
+
+
+def test_compact_timex(t_date, t_time, t_duration):
+    reference = pendulum.datetime(2021, 7, 18, tz="Asia/Tokyo")
+    for timex in [t_date, t_time, t_duration]:
+        compact = timex.to_compact()
+        assert not hasattr(compact, "__dict__")
+        assert compact.to_tag() == timex.to_tag()
+        assert repr(compact) == repr(timex)
+        assert compact.to_datetime() == timex.to_datetime()
+
+        compact.reference = reference
+        timex_with_reference = compact.to_timex()
+        assert compact.to_datetime() == timex_with_reference.to_datetime()
+
+    # 値が空の要素はparsedに保持しない
+    compact = t_time.to_compact()
+    assert compact.parsed == {"clock_hour": "18", "clock_minute": "20", "clock_second": "XX"}
+    assert t_duration.to_compact().to_duration() == t_duration.to_duration()
+
+
+def test_compact_timex_pattern():
+    pattern = Pattern(re_pattern="[0-9]+年", parse_func=lambda x: x, option={})
+    timex = TIMEX(type="DATE", value="2021-XX-XX", text="2021年", span=(0, 5), pattern=pattern)
+
+    compact = CompactTIMEX.from_timex(timex)
+    assert compact.pattern_id == pattern.register()
+    assert compact.pattern is pattern
+    assert compact.to_timex() == timex
+
+    restored = pickle.loads(pickle.dumps(compact))
+    assert restored == compact
+    assert restored.pattern is pattern
@@ -1,6 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pendulum
 import pytest
 
+from ja_timex.extract_filter import BaseFilter
+from ja_timex.pattern.place import Pattern, compile_pattern
 from ja_timex.tag import TIMEX
+from ja_timex.tagger import BaseTagger
 from ja_timex.timex import TimexParser
 
 
@@ -228,6 +234,27 @@ def test_range_expression_pattern(p):
     assert timexes[1].text == "20日"
 
 
+def test_range_expression_many_ranges(p):
+    # 時刻表のように範囲表現が多数含まれる場合
+    text = "".join(f"{h}時〜{h + 1}時、{h}時30分から翌{h + 2}時、" for h in range(20))
+    timexes = p.parse(text)
+    assert len(timexes) == 80
+    assert [t.range_start for t in timexes] == [True, None] * 40
+    assert [t.range_end for t in timexes] == [None, True] * 40
+
+    # 範囲表現の直前が、前のTIMEXの終了位置ではない場合
+    timexes = p.parse("3時の〜4時")
+    assert [(t.range_start, t.range_end) for t in timexes] == [(None, None), (None, None)]
+
+
+def test_range_expression_custom():
+    p_custom = TimexParser(range_expressions=["〜", "から", "ないし", "乃至"])
+    timexes = p_custom.parse("3日ないし5日")
+    assert [(t.range_start, t.range_end) for t in timexes] == [(True, None), (None, True)]
+    assert TimexParser().parse("3日ないし5日")[0].range_start is None
+    assert p_custom.config_fingerprint != TimexParser().config_fingerprint
+
+
 def test_range_expression_invalid(p):
     # 範囲表現が入っているものの、範囲の開始と終了を表すわけではない場合
 
@@ -245,6 +272,15 @@ def test_range_expression_invalid(p):
     assert p.parse("今週から3日間も雨が降り続いている")[1].range_end is None
 
 
+def test_extract_abbrev_patten_in_long_text(p):
+    prefix = "ああ12" * 1000 + "。"
+    timexes = p.parse(prefix + "3、4日")
+    assert [(t.text, t.span, t.raw_span) for t in timexes] == [
+        ("3", (len(prefix), len(prefix) + 1), (len(prefix), len(prefix) + 1)),
+        ("4日", (len(prefix) + 2, len(prefix) + 4), (len(prefix) + 2, len(prefix) + 4)),
+    ]
+
+
 def test_extract_abbrev_patten(p):
     # 範囲と似た表現ではあるが、範囲を表すわけではないので@rangeStartや@rangeEndは付与しない
 
@@ -501,6 +537,11 @@ def test_adjust_normalize_index_diff_multiple(p):
     assert t1.raw_text == "50,000年前"
     assert p.raw_text[t1.raw_span[0] : t1.raw_span[1]] == "50,000年前"
 
+    # 漢数字とカンマの両方を正規化する場合
+    timexes = p.parse("明治二十六年、今から30,000年〜50,000年前")
+    assert [t.raw_text for t in timexes] == ["明治二十六年", "30,000年", "50,000年前"]
+    assert [p.raw_text[t.raw_span[0] : t.raw_span[1]] for t in timexes] == ["明治二十六年", "30,000年", "50,000年前"]
+
 
 def test_raw_span_and_text_none(p):
     timex = p.parse("明治26年")[0]
@@ -510,3 +551,187 @@ def test_raw_span_and_text_none(p):
     assert timex.raw_text == "明治26年"
     assert timex.raw_span == (0, 5)
     assert p.raw_text[timex.raw_span[0] : timex.raw_span[1]] == "明治26年"
+
+
+def test_text_without_trigger_chars(p):
+    # パターンに必要な文字を一つも含まない場合は、正規化などの処理をせずに空のリストを返す
+    assert p.re_trigger_char.search("それはどうかな") is None
+    assert p.parse("それはどうかな") == []
+    assert p.parse("3人で行った") == []
+    assert p.parse("") == []
+
+    # 正規化によって必要な文字になりうる場合は処理を行う
+    assert p.re_trigger_char.search("１０：３０")
+    timexes = p.parse("１０：３０に集合")
+    assert len(timexes) == 1
+    assert timexes[0].value == "T10-30-XX"
+
+
+def test_parse_with_context(p):
+    context = p.parse_with_context("明治二十六年から明治四十二年まで")
+    assert context.raw_text == "明治二十六年から明治四十二年まで"
+    assert context.processed_text == "明治26年から明治42年まで"
+    assert [timex.raw_text for timex in context.timexes] == ["明治二十六年", "明治四十二年"]
+
+
+def test_parse_in_multiple_threads(p):
+    texts = ["明治二十六年から明治四十二年まで", "今から30,000年〜50,000年前", "10分維持するのに十分な食料", "それはどうかな"] * 50
+    expected = [[(t.value, t.raw_span) for t in p.parse(text)] for text in texts]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        contexts = list(executor.map(p.parse_with_context, texts))
+    assert [[(t.value, t.raw_span) for t in context.timexes] for context in contexts] == expected
+
+
+def test_default_arguments_are_not_shared():
+    p_ignore_kansuji = TimexParser(ignore_kansuji=True)
+    p_default = TimexParser()
+
+    assert p_ignore_kansuji.number_normalizer is not p_default.number_normalizer
+    assert p_ignore_kansuji.pattern_filters is not p_default.pattern_filters
+    assert p_ignore_kansuji.parse("三日後") == []
+    assert p_default.parse("三日後")[0].value == "P3D"
+
+
+def test_parse_batch(p):
+    texts = ["明治二十六年から明治四十二年まで", "今から30,000年〜50,000年前", "毎週3回と来週の月曜日", "それはどうかな"] * 5
+    expected = [p.parse(text) for text in texts]
+
+    assert p.parse_batch(texts, workers=1) == expected
+    assert p.parse_batch(iter(texts), workers=2, chunksize=3) == expected
+
+
+def test_parse_batch_with_references(p):
+    texts = ["明日", "明日", "3日前"]
+    references = [
+        pendulum.datetime(2021, 7, 18, tz="Asia/Tokyo"),
+        None,
+        pendulum.datetime(2021, 1, 1, tz="Asia/Tokyo"),
+    ]
+    results = p.parse_batch(texts, workers=2, chunksize=1, references=references)
+
+    assert [timexes[0].reference for timexes in results] == [references[0], None, references[2]]
+    assert results[0][0].to_datetime() == pendulum.datetime(2021, 7, 19, tz="Asia/Tokyo")
+    assert results[0][0].pattern is p.parse("明日")[0].pattern
+    assert results[2][0].to_datetime() == pendulum.datetime(2020, 12, 29, tz="Asia/Tokyo")
+
+
+def test_parse_batch_references_length_mismatch(p):
+    # 入力文字列と基準日時の数が異なる場合は、結果を切り詰めずにエラーとする
+    for texts, references in [(["明日", "明日", "3日前"], [None]), (["明日"], [None, None])]:
+        for workers in [1, 2]:
+            with pytest.raises(ValueError):
+                p.parse_batch(texts, workers=workers, chunksize=1, references=references)
+            with pytest.raises(ValueError):
+                p.parse_batch_columnar(texts, workers=workers, chunksize=1, references=references)
+
+
+def test_parse_batch_columnar(p):
+    texts = ["明治二十六年から明治四十二年まで", "今から30,000年〜50,000年前", "それはどうかな", "毎週3回と来週の月曜日"]
+    expected_rows = [
+        (doc_index, t.tid, t.type, t.value, t.text, t.span[0], t.span[1], t.raw_span[0], t.raw_span[1])
+        + (t.mod, t.freq, t.quant, t.range_start, t.range_end)
+        for doc_index, text in enumerate(texts)
+        for t in p.parse(text)
+    ]
+
+    for workers in [1, 2]:
+        columns = p.parse_batch_columnar(texts, workers=workers, chunksize=1)
+        assert len(columns) == len(expected_rows) == 7
+        # 文字列の列は共有の文字列表のインデックスで保持する
+        assert columns.columns["type"].typecode == "i"
+        assert len(columns.strings) == len(set(columns.strings))
+
+        pydict = columns.to_pydict()
+        assert list(zip(*[pydict[name] for name in columns.column_names])) == expected_rows
+
+
+def test_parse_batch_columnar_to_arrow(p):
+    pa = pytest.importorskip("pyarrow")
+    columns = p.parse_batch_columnar(["毎週3回", "明日"], workers=1)
+    table = columns.to_arrow()
+    assert isinstance(table, pa.Table)
+    assert table.column_names == list(columns.column_names)
+    assert table.to_pydict() == columns.to_pydict()
+
+
+def test_parse_stream(p):
+    text = "2021年7月18日から7月20日まで、毎週1回の会議を行う。来週の月曜日は10時30分開始です。" * 10
+    expected = [(t.tid, t.value, t.span, t.raw_span, t.range_start, t.range_end) for t in p.parse(text)]
+
+    chunks = [text[i : i + 7] for i in range(0, len(text), 7)]
+    for window_size, overlap in [(4096, 256), (40, 20), (10, 16)]:
+        timexes = list(p.parse_stream(chunks, window_size=window_size, overlap=overlap))
+        assert [(t.tid, t.value, t.span, t.raw_span, t.range_start, t.range_end) for t in timexes] == expected
+        assert all(text[t.raw_span[0] : t.raw_span[1]] == t.raw_text for t in timexes)
+
+
+def test_parse_stream_abbrev_range(p):
+    # 他のTIMEXの範囲内から始まる、省略された範囲表現もparse()と同様に返す
+    texts = ["1秒05、1週", "7月18日〜20日と、3時から5時まで。1秒05、1週" * 3]
+    for text in texts:
+        expected = [(t.tid, t.value, t.span, t.raw_span, t.range_start, t.range_end) for t in p.parse(text)]
+        # チャンクやウィンドウの境界が時間表現の途中にある場合も同一の結果となる
+        for chunk_size in [1, 3, len(text)]:
+            chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+            for window_size, overlap in [(4096, 256), (4, 16), (7, 12)]:
+                timexes = list(p.parse_stream(chunks, window_size=window_size, overlap=overlap))
+                assert [(t.tid, t.value, t.span, t.raw_span, t.range_start, t.range_end) for t in timexes] == expected
+
+
+def test_parse_stream_with_normalization(p):
+    chunks = ["明治二十六年から", "。" * 20, "今から30,0", "00年前", "まで"]
+    timexes = list(p.parse_stream(chunks, window_size=5, overlap=8))
+
+    text = "".join(chunks)
+    assert [t.raw_text for t in timexes] == ["明治二十六年", "30,000年前"]
+    assert [text[t.raw_span[0] : t.raw_span[1]] for t in timexes] == ["明治二十六年", "30,000年前"]
+    assert [t.value for t in timexes] == ["1893-XX-XX", "P30000Y"]
+
+
+def test_select_extracts(p):
+    text = "2021年7月18日から3日間"
+    ordered_candidates = list(p._iter_ordered_candidates(text))
+    assert ordered_candidates == sorted(ordered_candidates)
+    # 候補はre.Matchを持たず、範囲とパターンのインデックスのみを持つ
+    start_i, negative_length, type_id, pattern_id = ordered_candidates[0]
+    assert (start_i, start_i - negative_length) == (0, 10)
+    assert p.type_names[type_id] == "abstime"
+    assert p.pattern_list[pattern_id].re_compiled.fullmatch(text[:10])
+
+    type2extracts = p._select_extracts(ordered_candidates, text)
+    spans = sorted(extract.re_match.span() for extracts in type2extracts.values() for extract in extracts)
+    assert spans == [(0, 10), (12, 15)]
+
+
+def test_select_extracts_after_pattern_changed():
+    pattern = Pattern(re_pattern="皇紀[0-9]{1,4}年", parse_func=lambda re_match, pattern: None, option={})
+    p_custom = TimexParser(custom_tagger=BaseTagger(patterns=[pattern]))
+
+    # 構築後にPatternの正規表現が変更されても、走査と同じ正規表現でre.Matchを求める
+    pattern.re_pattern = "皇紀[0-9]{1,4}"
+    pattern.re_compiled = compile_pattern(pattern.re_pattern)
+    type2extracts = p_custom._select_extracts(p_custom._iter_ordered_candidates("皇紀2681年"), "皇紀2681年")
+    assert [extract.re_match.group() for extract in type2extracts["custom"]] == ["皇紀2681年"]
+
+
+def test_adaptive_filter_order(p):
+    p_adaptive = TimexParser(adaptive_filter_order=True)
+    p_adaptive.filter_pipeline.reorder_interval = 5
+    texts = ["7-8メートル", "13/13", "0.5", "毎日新聞によると", "2021年7月18日"] * 10
+    for text in texts:
+        assert p_adaptive.parse(text) == p.parse(text)
+
+    p_custom = TimexParser()
+    p_custom.pattern_filters = []
+    assert p_custom.parse("7-8メートル") != p.parse("7-8メートル")
+
+    # pattern_filtersの要素を置き換えた場合も反映される
+    class RejectAll(BaseFilter):
+        def filter(self, extract, text):
+            return True
+
+    p_custom = TimexParser()
+    assert p_custom.parse("2021年7月18日")
+    p_custom.pattern_filters[0] = RejectAll()
+    assert p_custom.parse("2021年7月18日") == []
@@ -0,0 +1,51 @@
+import pytest
+
+from ja_timex.util import (
+    RangeExpressionMatcher,
+    detect_range_expression_before_timex,
+    find_abbrev_number_start,
+    get_abbrev_suffix,
+    get_range_expression_matcher,
+)
+
+
+def test_range_expression_matcher():
+    matcher = RangeExpressionMatcher(["〜", "から", "から翌", "〜から"])
+    assert matcher.max_len == 3
+
+    assert matcher.find_before(3, "1日〜2日") == "〜"
+    assert matcher.find_before(4, "1日から2日") == "から"
+    assert matcher.find_before(5, "1日から翌2日") == "から翌"
+    # 複数の表現が当てはまる場合は最も長いものを返す
+    assert matcher.find_before(5, "1日〜から2日") == "〜から"
+    # 直前にない場合や、文字列の先頭
+    assert matcher.find_before(4, "1日〜の2日") is None
+    assert matcher.find_before(0, "〜2日") is None
+    assert matcher.find_before(1, "〜2日") == "〜"
+
+    with pytest.raises(ValueError):
+        RangeExpressionMatcher([])
+
+
+def test_detect_range_expression_before_timex():
+    assert detect_range_expression_before_timex(3, "1日〜2日") == "〜"
+    assert detect_range_expression_before_timex(3, "1日、2日") is None
+    assert detect_range_expression_before_timex(3, "1日、2日", range_expressions=["、"]) == "、"
+
+    # 同じ表現の組み合わせに対しては、構築済みのRangeExpressionMatcherを共有する
+    assert get_range_expression_matcher(("、",)) is get_range_expression_matcher(("、",))
+    matcher = RangeExpressionMatcher(["ないし"])
+    assert detect_range_expression_before_timex(5, "1日ないし2日", range_expressions=matcher) == "ないし"
+
+
+def test_find_abbrev_number_start():
+    assert find_abbrev_number_start(6, "午後12:30〜1時") == 2
+    assert find_abbrev_number_start(4, "あいう1、2日") == 3
+    assert find_abbrev_number_start(3, "あいう、2日") == 3
+    assert find_abbrev_number_start(0, "1、2日") == 0
+
+
+def test_get_abbrev_suffix():
+    assert get_abbrev_suffix("2ヶ月") == "ヶ月"
+    assert get_abbrev_suffix("10.5日間") == "日間"
+    assert get_abbrev_suffix("毎日") is None